@@ -0,0 +1,470 @@
+import base64
+import json
+import math
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from time import monotonic
+from typing import Any, Callable, Sequence
+from sqlalchemy import select, func, tuple_, or_, Select, Exists, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import DATERANGE
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm.interfaces import ORMOption
+from hotel_business_module.gateways.categories_gateway import CategoriesGateway
+from hotel_business_module.gateways.photos_gateway import PhotosGateway
+from hotel_business_module.gateways.rooms_gateway import RoomsGateway
+from hotel_business_module.gateways.sales_gateway import SalesGateway
+from hotel_business_module.gateways.tags_gateway import TagsGateway
+from hotel_business_module.models.base import Base
+from hotel_business_module.models.categories import Category as DbCategory
+from hotel_business_module.models.photos import Photo as DbPhoto
+from hotel_business_module.models.rooms import Room as DbRoom
+from hotel_business_module.models.sales import Sale as DbSale
+from hotel_business_module.models.tags import Tag as DbTag
+from bookings.models import RoomBooking
+from indexes import CATEGORY_DOCUMENT, SEARCH_CONFIG
+from config import app_settings
+from catalog.version import catalog_version
+
+
+async def run_gateway(db: AsyncSession, method: Callable, *args, **kwargs) -> Any:
+    """
+    Вызов метода синхронного шлюза на асинхронной сессии. Метод выполняется в greenlet'е
+    поверх синхронной сессии, поэтому бизнес-логика шлюзов переиспользуется без блокировки цикла событий
+    :param db: асинхронная сессия sqlalchemy
+    :param method: метод синхронного шлюза, принимающий сессию в параметре db
+    :return: результат метода
+    """
+    return await db.run_sync(lambda session: method(*args, db=session, **kwargs))
+
+
+def room_is_booked(start: date, end: date) -> Exists:
+    """
+    Условие "комната занята хотя бы в один день периода [start, end)" по GiST индексу диапазонов бронирований
+    :param start: дата заезда
+    :param end: дата выезда
+    :return:
+    """
+    period = func.daterange(start, end, '[)', type_=DATERANGE)
+    return exists().where(RoomBooking.room_id == DbRoom.id, RoomBooking.during.overlaps(period))
+
+
+class AsyncGateway:
+    """
+    Базовый асинхронный шлюз
+    """
+    model: type[Base]
+
+    @classmethod
+    async def get_by_id(cls, obj_id: int, db: AsyncSession, options: Sequence[ORMOption] = ()) -> Base | None:
+        """
+        Получение объекта по идентификатору
+        :param obj_id: идентификатор
+        :param db: асинхронная сессия sqlalchemy
+        :param options: опции загрузки связей
+        :return:
+        """
+        return await db.get(cls.model, obj_id, options=options)
+
+    @classmethod
+    async def get_all(cls, db: AsyncSession, options: Sequence[ORMOption] = ()) -> Sequence[Base]:
+        """
+        Получение всех объектов
+        :param db: асинхронная сессия sqlalchemy
+        :param options: опции загрузки связей
+        :return:
+        """
+        result = await db.scalars(select(cls.model).options(*options).order_by(cls.model.id))
+        return result.all()
+
+
+class CountsCache:
+    """
+    Кэш количества строк (или других агрегатов) по фильтру с ограниченным временем жизни
+    """
+    def __init__(self, ttl: float, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: dict[Any, tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Any | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] <= monotonic():
+                return None
+            return item[0]
+
+    def set(self, key, count: Any):
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                self._items.clear()
+            self._items[key] = (count, monotonic() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class AsyncCategoriesGateway(AsyncGateway):
+    model = DbCategory
+
+    # поля, по которым разрешена сортировка
+    SORT_FIELDS = {
+        'id', 'name', 'price', 'beds', 'floors', 'square', 'rooms_count',
+        'prepayment_percent', 'refund_percent', 'date_created',
+    }
+    # параметры фильтра диапазонами и соответствующие им колонки
+    RANGE_FIELDS = {
+        'beds': DbCategory.beds,
+        'floors': DbCategory.floors,
+        'square': DbCategory.square,
+        'price': DbCategory.price,
+        'rooms': DbCategory.rooms_count,
+    }
+    # параметры, не влияющие на количество найденных категорий
+    PAGINATION_FIELDS = {'page', 'page_size', 'desc', 'sort_by', 'after', 'price_date'}
+
+    counts_cache = CountsCache(ttl=app_settings.CATEGORIES_COUNT_CACHE_TTL)
+
+    @classmethod
+    def build_filter_query(cls, filter: dict) -> Select:
+        """
+        Построение запроса категорий по параметрам фильтрации (без сортировки и пагинации)
+        :param filter: параметры фильтрации
+        :return:
+        """
+        query = select(DbCategory)
+        if not filter.get('show_hidden', False):
+            query = query.where(DbCategory.is_hidden.is_(False))
+        if 'id' in filter:
+            query = query.where(DbCategory.id == filter['id'])
+        if 'name' in filter:
+            query = query.where(DbCategory.name.ilike(f'%{filter["name"]}%'))
+        for field, column in cls.RANGE_FIELDS.items():
+            if f'{field}_from' in filter:
+                query = query.where(column >= filter[f'{field}_from'])
+            if f'{field}_until' in filter:
+                query = query.where(column <= filter[f'{field}_until'])
+        return query
+
+    @classmethod
+    def encode_cursor(cls, value: Any, last_id: int, sort_by: str, desc: bool) -> str:
+        """
+        Кодирование курсора, указывающего на категорию, после которой начинается следующая страница
+        :param value: значение поля сортировки у последней категории текущей страницы
+        :param last_id: идентификатор последней категории текущей страницы
+        :param sort_by: поле сортировки
+        :param desc: сортировка по убыванию
+        :return:
+        """
+        if isinstance(value, (Decimal, datetime)):
+            value = str(value)
+        data = json.dumps([sort_by, desc, value, last_id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode_cursor(cls, cursor: str, sort_by: str, desc: bool) -> tuple[Any, int]:
+        """
+        Декодирование курсора
+        :param cursor: курсор, полученный от клиента
+        :param sort_by: текущее поле сортировки
+        :param desc: текущая сортировка по убыванию
+        :return: значение поля сортировки и идентификатор последней категории
+        """
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            cursor_sort_by, cursor_desc, value, last_id = json.loads(data)
+        except (ValueError, TypeError):
+            raise ValueError('Неверный курсор')
+        if cursor_sort_by != sort_by or cursor_desc != desc:
+            raise ValueError('Курсор не соответствует параметрам сортировки')
+        # значения из курсора приводятся к типу поля сортировки, подделанный курсор дает ошибку 400, а не 500
+        try:
+            if not isinstance(last_id, int) or isinstance(last_id, bool):
+                raise TypeError
+            if sort_by == 'price':
+                value = Decimal(value)
+                if not value.is_finite():
+                    raise ValueError
+            elif sort_by == 'date_created':
+                value = datetime.fromisoformat(value)
+            elif sort_by == 'name':
+                if not isinstance(value, str):
+                    raise TypeError
+            elif value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+                raise TypeError
+        except (ValueError, TypeError, ArithmeticError):
+            raise ValueError('Неверный курсор')
+        return value, last_id
+
+    @classmethod
+    async def count(cls, filter: dict, db: AsyncSession) -> int:
+        """
+        Количество категорий по фильтру. Значение кэшируется до изменения каталога, чтобы не выполнять COUNT
+        на каждую страницу
+        :param filter: параметры фильтрации
+        :param db: асинхронная сессия sqlalchemy
+        :return:
+        """
+        key = (
+            catalog_version.current(),
+            frozenset((field, value) for field, value in filter.items() if field not in cls.PAGINATION_FIELDS),
+        )
+        count = cls.counts_cache.get(key)
+        if count is None:
+            query = cls.build_filter_query(filter).with_only_columns(func.count(DbCategory.id)).order_by(None)
+            count = await db.scalar(query)
+            cls.counts_cache.set(key, count)
+        return count
+
+    @classmethod
+    async def filter(cls, filter: dict, db: AsyncSession) -> tuple[Sequence[DbCategory], int, str | None]:
+        """
+        Поиск категорий с пагинацией по номеру страницы или по курсору (параметр after)
+        :param filter: параметры фильтрации
+        :param db: асинхронная сессия sqlalchemy
+        :return: категории, количество страниц и курсор следующей страницы
+        """
+        sort_by = filter.get('sort_by', 'id')
+        if sort_by not in cls.SORT_FIELDS:
+            raise ValueError(f'Сортировка по полю {sort_by} не поддерживается')
+        if 'effective_price_from' in filter or 'effective_price_until' in filter:
+            # фактические цены считаются только календарем цен в памяти
+            raise ValueError('Фильтр по фактической цене доступен только при поиске по снимку каталога без параметра after')
+        desc = filter.get('desc', False)
+        page_size = filter.get('page_size', 8)
+        if page_size < 1:
+            raise ValueError('Размер страницы должен быть больше нуля')
+
+        sort_column = getattr(DbCategory, sort_by)
+        query = cls.build_filter_query(filter)
+        if desc:
+            query = query.order_by(sort_column.desc(), DbCategory.id.desc())
+        else:
+            query = query.order_by(sort_column, DbCategory.id)
+
+        if 'after' in filter:
+            # keyset пагинация - время ответа не зависит от глубины страницы
+            value, last_id = cls.decode_cursor(filter['after'], sort_by, desc)
+            key, bound = tuple_(sort_column, DbCategory.id), tuple_(value, last_id)
+            query = query.where(key < bound if desc else key > bound)
+        else:
+            query = query.offset((max(filter.get('page', 1), 1) - 1) * page_size)
+
+        # берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        items = (await db.scalars(query.limit(page_size + 1))).all()
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = cls.encode_cursor(getattr(items[-1], sort_by), items[-1].id, sort_by, desc)
+
+        pages_count = math.ceil(await cls.count(filter, db) / page_size)
+        return items, pages_count, next_cursor
+
+    @classmethod
+    async def search(cls, text_query: str, filter: dict, db: AsyncSession) -> tuple[Sequence[DbCategory], int]:
+        """
+        Полнотекстовый поиск по названию и описанию с учетом опечаток (Postgres, индексы tsvector и pg_trgm),
+        результаты упорядочены по релевантности
+        :param text_query: поисковый запрос
+        :param filter: параметры фильтрации (сортировка и курсор не используются)
+        :param db: асинхронная сессия sqlalchemy
+        :return: категории страницы и количество страниц
+        """
+        if 'effective_price_from' in filter or 'effective_price_until' in filter:
+            # фактические цены считаются только календарем цен в памяти, как и в filter
+            raise ValueError('Фильтр по фактической цене недоступен при полнотекстовом поиске')
+        page_size = filter.get('page_size', 8)
+        if page_size < 1:
+            raise ValueError('Размер страницы должен быть больше нуля')
+
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, text_query)
+        query = cls.build_filter_query(filter).where(or_(
+            CATEGORY_DOCUMENT.op('@@')(ts_query),
+            # похожесть по триграммам выше порога pg_trgm.similarity_threshold
+            DbCategory.name.op('%')(text_query),
+            DbCategory.description.op('%>')(text_query),
+        ))
+
+        key = (
+            catalog_version.current(),
+            text_query,
+            frozenset((field, value) for field, value in filter.items() if field not in cls.PAGINATION_FIELDS),
+        )
+        count = cls.counts_cache.get(key)
+        if count is None:
+            count = await db.scalar(query.with_only_columns(func.count(DbCategory.id)).order_by(None))
+            cls.counts_cache.set(key, count)
+
+        rank = func.ts_rank_cd(CATEGORY_DOCUMENT, ts_query) + func.similarity(DbCategory.name, text_query)
+        query = query.order_by(rank.desc(), DbCategory.id).offset((max(filter.get('page', 1), 1) - 1) * page_size)
+        items = (await db.scalars(query.limit(page_size))).all()
+        return items, math.ceil(count / page_size)
+
+    @staticmethod
+    async def get_familiar(category: DbCategory, db: AsyncSession) -> Sequence[DbCategory]:
+        return await run_gateway(db, CategoriesGateway.get_familiar, category)
+
+    @staticmethod
+    async def delete_category(category: DbCategory, db: AsyncSession):
+        await run_gateway(db, CategoriesGateway.delete_category, category)
+
+    @staticmethod
+    async def add_tag_to_category(category: DbCategory, tag: DbTag, db: AsyncSession):
+        await run_gateway(db, CategoriesGateway.add_tag_to_category, category, tag)
+
+    @staticmethod
+    async def remove_tag_from_category(category: DbCategory, tag: DbTag, db: AsyncSession):
+        await run_gateway(db, CategoriesGateway.remove_tag_from_category, category, tag)
+
+    @staticmethod
+    async def add_sale_to_category(category: DbCategory, sale: DbSale, db: AsyncSession):
+        await run_gateway(db, CategoriesGateway.add_sale_to_category, category, sale)
+
+    @staticmethod
+    async def remove_sale_to_category(category: DbCategory, sale: DbSale, db: AsyncSession):
+        await run_gateway(db, CategoriesGateway.remove_sale_to_category, category, sale)
+
+
+class AsyncRoomsGateway(AsyncGateway):
+    model = DbRoom
+
+    @staticmethod
+    async def save_room(room: DbRoom, db: AsyncSession):
+        await run_gateway(db, RoomsGateway.save_room, room)
+
+    @staticmethod
+    async def delete_room(room: DbRoom, db: AsyncSession):
+        await run_gateway(db, RoomsGateway.delete_room, room)
+
+    @staticmethod
+    async def get_available(
+            start: date,
+            end: date,
+            db: AsyncSession,
+            category_id: int | None = None,
+            busy_rooms: set[int] | None = None,
+    ) -> Sequence[DbRoom]:
+        """
+        Комнаты открытых категорий, свободные на период [start, end)
+        :param start: дата заезда
+        :param end: дата выезда
+        :param db: асинхронная сессия sqlalchemy
+        :param category_id: идентификатор категории, если поиск только по ней
+        :param busy_rooms: занятые комнаты из индекса в памяти. Если не переданы,
+        пересечения ищутся в базе по GiST индексу диапазонов бронирований
+        :return: комнаты с загруженными категориями
+        """
+        query = select(DbRoom).join(DbRoom.category).where(DbCategory.is_hidden.is_(False))
+        if category_id is not None:
+            query = query.where(DbRoom.category_id == category_id)
+        if busy_rooms is None:
+            query = query.where(~room_is_booked(start, end))
+        elif busy_rooms:
+            query = query.where(DbRoom.id.not_in(busy_rooms))
+        # категория уже в join'е, отдельный запрос для нее не нужен
+        query = query.options(contains_eager(DbRoom.category)).order_by(DbRoom.category_id, DbRoom.id)
+        return (await db.scalars(query)).all()
+
+
+class AsyncBookingsGateway(AsyncGateway):
+    model = RoomBooking
+
+    # код ошибки postgres при нарушении ограничения исключения
+    EXCLUSION_VIOLATION = '23P01'
+
+    @classmethod
+    async def book_room(
+            cls,
+            category_id: int,
+            start: date,
+            end: date,
+            db: AsyncSession,
+            client_id: int | None = None,
+    ) -> RoomBooking:
+        """
+        Бронирование свободной комнаты категории на период [start, end).
+        Каждая попытка - короткая транзакция: кандидат выбирается с блокировкой строки комнаты
+        (FOR UPDATE SKIP LOCKED), поэтому параллельные запросы разбирают разные комнаты, не дожидаясь друг друга.
+        Если все свободные комнаты заблокированы параллельными бронированиями (возможно, на другие даты),
+        кандидат выбирается повторно с ожиданием блокировки, а не отказом.
+        Если бронь все же пересеклась с только что зафиксированной чужой (ограничение исключения),
+        попытка повторяется
+        :param category_id: идентификатор категории
+        :param start: дата заезда
+        :param end: дата выезда
+        :param db: асинхронная сессия sqlalchemy
+        :param client_id: идентификатор клиента
+        :return: созданная бронь
+        """
+        if end <= start:
+            raise ValueError('Дата выезда должна быть позже даты заезда')
+        if start < date.today():
+            raise ValueError('Дата заезда не может быть в прошлом')
+
+        candidates = (
+            select(DbRoom.id)
+            .where(DbRoom.category_id == category_id, ~room_is_booked(start, end))
+            .order_by(DbRoom.id)
+            .limit(1)
+        )
+        query = candidates.with_for_update(of=DbRoom, skip_locked=True)
+        waiting_query = candidates.with_for_update(of=DbRoom)
+        # запросы, выполненные до бронирования, не должны удлинять его транзакцию
+        await db.commit()
+        for _ in range(app_settings.BOOKING_ATTEMPTS):
+            room_id = await db.scalar(query)
+            if room_id is None:
+                # SKIP LOCKED пропускает и свободные комнаты, которые сейчас бронируют на другие даты.
+                # Транзакции бронирования короткие, поэтому перед отказом дожидаемся их блокировок
+                room_id = await db.scalar(waiting_query)
+            if room_id is None:
+                await db.rollback()
+                raise ValueError('Нет свободных комнат на выбранные даты')
+            booking = RoomBooking(room_id=room_id, client_id=client_id, date_start=start, date_end=end)
+            db.add(booking)
+            try:
+                await db.commit()
+            except IntegrityError as err:
+                await db.rollback()
+                if getattr(err.orig, 'sqlstate', None) != cls.EXCLUSION_VIOLATION:
+                    raise ValueError('Ошибка сохранения брони')
+                continue
+            return booking
+        raise ValueError('Не удалось забронировать комнату, повторите попытку')
+
+    @staticmethod
+    async def cancel_booking(booking: RoomBooking, db: AsyncSession):
+        await db.delete(booking)
+        await db.commit()
+
+
+class AsyncTagsGateway(AsyncGateway):
+    model = DbTag
+
+    @staticmethod
+    async def save_tag(tag: DbTag, db: AsyncSession):
+        await run_gateway(db, TagsGateway.save_tag, tag)
+
+    @staticmethod
+    async def delete_tag(tag: DbTag, db: AsyncSession):
+        await run_gateway(db, TagsGateway.delete_tag, tag)
+
+
+class AsyncSalesGateway(AsyncGateway):
+    model = DbSale
+
+    @staticmethod
+    async def delete_sale(sale: DbSale, db: AsyncSession):
+        await run_gateway(db, SalesGateway.delete_sale, sale)
+
+
+class AsyncPhotosGateway(AsyncGateway):
+    model = DbPhoto
+
+    @staticmethod
+    async def delete_photo(photo: DbPhoto, db: AsyncSession):
+        await run_gateway(db, PhotosGateway.delete_photo, photo)
@@ -0,0 +1,52 @@
+import jwt
+from sqlalchemy.orm import Session
+from hotel_business_module.gateways.users_gateway import UsersGateway
+from hotel_business_module.settings import settings
+from users_cache import CachedUser
+from dependencies import load_user_entry
+
+
+def add_scopes(access_token: str, entry: CachedUser) -> str:
+    """
+    Добавление в токен доступа разрешений пользователя и версии его прав
+    :param access_token: токен доступа, выпущенный UsersGateway
+    :param entry: пользователь из кэша
+    :return: новый токен доступа
+    """
+    payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=['HS256'])
+    payload['sub'] = str(payload['id'])
+    payload['scopes'] = sorted(entry.permissions)
+    payload['is_superuser'] = entry.is_superuser
+    payload['permissions_version'] = entry.permissions_version
+    # версия пользователя на момент выпуска: пока она не сменилась, права в токене актуальны
+    payload['users_version'] = entry.version
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def generate_auth_tokens(user_id: int, db: Session) -> tuple[str, str]:
+    """
+    Генерация пары токенов, где токен доступа содержит разрешения пользователя
+    :param user_id: идентификатор пользователя
+    :param db: сессия sqlalchemy
+    :return: токен доступа и токен обновления
+    """
+    access_token, refresh_token = UsersGateway.generate_auth_tokens(user_id)
+    entry = load_user_entry(user_id, db)
+    if entry is None:
+        raise ValueError('Пользователь не найден')
+    return add_scopes(access_token, entry), refresh_token
+
+
+def refresh_auth_tokens(token: str, db: Session) -> tuple[str, str]:
+    """
+    Обновление пары токенов с актуальными разрешениями пользователя
+    :param token: токен обновления
+    :param db: сессия sqlalchemy
+    :return: токен доступа и токен обновления
+    """
+    access_token, refresh_token = UsersGateway.refresh_auth_tokens(token, db)
+    user_id = jwt.decode(access_token, settings.SECRET_KEY, algorithms=['HS256'])['id']
+    entry = load_user_entry(user_id, db)
+    if entry is None:
+        raise ValueError('Пользователь не найден')
+    return add_scopes(access_token, entry), refresh_token
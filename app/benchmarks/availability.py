@@ -0,0 +1,47 @@
+"""
+Бенчмарк поиска свободных комнат по индексу бронирований в памяти:
+все комнаты отеля, заполненный на год вперед календарь, случайные периоды проживания.
+Запуск из папки app: python -m benchmarks.availability
+"""
+import random
+from datetime import date, timedelta
+from timeit import timeit
+from bookings.availability import AvailabilityIndex
+
+
+ROOMS = 500
+DAYS = 365
+REPEAT = 200
+
+
+def make_bookings(start: date) -> list[tuple[int, int, date, date]]:
+    bookings = []
+    for room_id in range(ROOMS):
+        day = random.randint(0, 3)
+        while day < DAYS:
+            nights = random.randint(1, 7)
+            bookings.append((len(bookings), room_id, start + timedelta(days=day), start + timedelta(days=day + nights)))
+            day += nights + random.randint(0, 4)
+    return bookings
+
+
+def main():
+    random.seed(0)
+    today = date.today()
+    bookings = make_bookings(today)
+    index = AvailabilityIndex()
+    build = timeit(lambda: index.build(bookings, 'benchmark'), number=1) * 1000
+
+    periods = []
+    for _ in range(REPEAT):
+        start = today + timedelta(days=random.randint(0, DAYS))
+        periods.append((start, start + timedelta(days=random.randint(1, 14))))
+    search = timeit(lambda: [index.busy_rooms(*period) for period in periods], number=1) / REPEAT * 1000
+
+    print(f'комнат - {ROOMS}, бронирований - {len(bookings)}')
+    print(f'построение индекса: {build:.2f} мс')
+    print(f'поиск занятых комнат на период: {search:.3f} мс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Нагрузочная проверка бронирования: сотни параллельных попыток забронировать комнату одной категории.
+Считает пропускную способность и проверяет, что ни одна комната не забронирована дважды на пересекающиеся даты.
+Ложные отказы ("нет свободных комнат", хотя комната на эти даты осталась свободной и после всех попыток)
+считаются отдельно от обоснованных.
+Нужна запущенная база с категорией, в которой есть комнаты. Созданные брони в конце удаляются.
+Запуск из папки app: python -m benchmarks.booking_concurrency <category_id> [попыток]
+"""
+import asyncio
+import random
+import sys
+from datetime import date, timedelta
+from time import perf_counter
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import aliased
+from async_gateways import AsyncBookingsGateway, room_is_booked
+from bookings.availability import bookings_version
+from bookings.models import RoomBooking
+from hotel_business_module.models.rooms import Room as DbRoom
+from database import async_engine, async_session
+
+
+DAYS = 30
+
+
+async def attempt(category_id: int, start: date, end: date) -> tuple[int | None, str | None]:
+    async with async_session() as db:
+        try:
+            booking = await AsyncBookingsGateway.book_room(category_id, start, end, db)
+        except ValueError as err:
+            return None, str(err)
+        return booking.id, None
+
+
+async def spurious_rejections(category_id: int, periods: list[tuple[date, date]]) -> int:
+    # брони во время проверки только добавлялись, поэтому комната, свободная сейчас, была свободна и при отказе
+    query = select(DbRoom.id).where(DbRoom.category_id == category_id).limit(1)
+    count = 0
+    async with async_session() as db:
+        for start, end in periods:
+            if await db.scalar(query.where(~room_is_booked(start, end))) is not None:
+                count += 1
+    return count
+
+
+async def overbooked_rooms(booking_ids: list[int]) -> int:
+    # пары пересекающихся броней одной комнаты среди созданных
+    other = aliased(RoomBooking)
+    query = (
+        select(func.count())
+        .select_from(RoomBooking)
+        .join(other, (other.room_id == RoomBooking.room_id) & (other.id > RoomBooking.id))
+        .where(RoomBooking.during.overlaps(other.during), RoomBooking.id.in_(booking_ids))
+    )
+    async with async_session() as db:
+        return await db.scalar(query)
+
+
+async def main(category_id: int, attempts: int):
+    random.seed(0)
+    first_day = date.today() + timedelta(days=1)
+    periods = []
+    for _ in range(attempts):
+        start = first_day + timedelta(days=random.randint(0, DAYS))
+        periods.append((start, start + timedelta(days=random.randint(1, 5))))
+
+    started = perf_counter()
+    results = await asyncio.gather(*(attempt(category_id, *period) for period in periods))
+    elapsed = perf_counter() - started
+
+    booking_ids = [booking_id for booking_id, _ in results if booking_id is not None]
+    overlaps = await overbooked_rooms(booking_ids)
+    # отказы из-за исчерпания повторов после конфликтов - отдельно от отказов "нет свободных комнат"
+    sold_out = [
+        period for period, (booking_id, error) in zip(periods, results)
+        if booking_id is None and error == 'Нет свободных комнат на выбранные даты'
+    ]
+    spurious = await spurious_rejections(category_id, sold_out)
+    retries_exhausted = attempts - len(booking_ids) - len(sold_out)
+    async with async_session() as db:
+        await db.execute(delete(RoomBooking).where(RoomBooking.id.in_(booking_ids)))
+        await db.commit()
+    # брони создавались в обход роутера - индексы свободных комнат в воркерах перестроятся из базы
+    bookings_version.bump()
+    await async_engine.dispose()
+
+    print(f'попыток - {attempts}, забронировано - {len(booking_ids)}, отказов - {attempts - len(booking_ids)}')
+    print(
+        f'нет свободных комнат - {len(sold_out) - spurious}, ложных отказов при свободной комнате - {spurious}, '
+        f'исчерпаны повторы - {retries_exhausted}'
+    )
+    print(f'время - {elapsed:.2f} с, {attempts / elapsed:.1f} попыток/с')
+    print(f'пересекающихся броней одной комнаты - {overlaps}')
+    if overlaps or spurious:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 300))
@@ -0,0 +1,88 @@
+"""
+Бенчмарк накладных расходов миддлвэа логгирования запросов: приложение без миддлвэа,
+прежний log_requests через @app.middleware('http') (BaseHTTPMiddleware) и ASGI миддлвэа RequestLoggingMiddleware.
+Запросы подаются в приложение напрямую через интерфейс ASGI, без сервера и сети.
+Запуск из папки app: python -m benchmarks.middleware [запросов]
+"""
+import asyncio
+import logging
+import sys
+import uuid
+from statistics import median
+from time import perf_counter, time
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from middleware import RequestLoggingMiddleware
+
+
+logger = logging.getLogger('requests_logger')
+
+
+async def log_requests(request: Request, call_next):
+    # прежняя реализация без записи пулов соединений
+    request_id = uuid.uuid4().hex
+    start_time = time()
+    logger.info(
+        f'Начато выполнение запроса {request_id} по адресу {request.url.path}. Метод запроса - {request.method}'
+    )
+    response = await call_next(request)
+    process_time = time() - start_time
+    logger.info(f'Запрос {request_id} выполнен за {process_time}. Код ответа - {response.status_code}')
+    return response
+
+
+def make_app(mode: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/ping')
+    async def ping():
+        return PlainTextResponse('pong')
+
+    if mode == 'http':
+        app.middleware('http')(log_requests)
+    elif mode == 'asgi':
+        app.add_middleware(RequestLoggingMiddleware)
+    return app
+
+
+SCOPE = {
+    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+    'path': '/ping', 'raw_path': b'/ping', 'root_path': '', 'query_string': b'', 'headers': [],
+    'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+}
+
+
+async def call(app: FastAPI):
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    await app(dict(SCOPE), receive, send)
+
+
+async def measure(app: FastAPI, count: int) -> list[float]:
+    # прогрев: сборка стека миддлвэа при первом запросе
+    for _ in range(100):
+        await call(app)
+    timings = []
+    for _ in range(count):
+        started = perf_counter()
+        await call(app)
+        timings.append(perf_counter() - started)
+    return sorted(timings)
+
+
+def main(count: int):
+    # замеряем сами миддлвэа, запись логов отключена
+    logger.setLevel(logging.WARNING)
+    modes = (('none', 'без миддлвэа'), ('http', "@app.middleware('http')"), ('asgi', 'RequestLoggingMiddleware'))
+    for mode, name in modes:
+        timings = asyncio.run(measure(make_app(mode), count))
+        p99 = timings[int(len(timings) * 0.99)]
+        print(f'{name:<28} p50 {median(timings) * 1e6:>8.1f} мкс    p99 {p99 * 1e6:>8.1f} мкс')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,108 @@
+"""
+Бенчмарк задержки, которую логирование добавляет к запросу:
+два сообщения на запрос, как в миддлвэа логгирования запросов.
+Сравниваются прежняя схема (FileHandler пишет в файл прямо из обработчика запроса)
+и очередь с фоновой записью из logger_conf. Запись в файл периодически "подвисает" на заданное время,
+как при сбросе кэша диска, - именно эти задержки прежняя схема переносит на запросы.
+Запуск из папки app: python -m benchmarks.request_logging [запросов] [подвисание, мс]
+"""
+import logging
+import os
+import queue
+import sys
+import tempfile
+import time
+import uuid
+from statistics import median
+from logger_conf import QueueDispatcher, QueueForwardHandler, SamplingFilter, JsonFormatter
+
+
+STALL_EVERY = 500
+
+
+class StallingFileHandler(logging.FileHandler):
+    """
+    Файловый обработчик, имитирующий редкие подвисания диска
+    """
+    def __init__(self, filename: str, stall: float):
+        super().__init__(filename, delay=True)
+        self.stall = stall
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord):
+        self.count += 1
+        if self.count % STALL_EVERY == 0:
+            time.sleep(self.stall)
+        super().emit(record)
+
+
+def sync_logger(path: str, stall: float) -> logging.Logger:
+    handler = StallingFileHandler(path, stall)
+    handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+    logger = logging.getLogger('bench_sync')
+    logger.addHandler(handler)
+    return logger
+
+
+def queue_logger(path: str, stall: float, rate: float) -> tuple[logging.Logger, QueueDispatcher]:
+    handler = StallingFileHandler(path, stall)
+    handler.setFormatter(JsonFormatter())
+    dispatcher = QueueDispatcher(queue.SimpleQueue())
+    logger = logging.getLogger(f'bench_queue_{rate}')
+    logger.addHandler(QueueForwardHandler(dispatcher.queue, handler))
+    logger.addFilter(SamplingFilter(rate))
+    dispatcher.start()
+    return logger, dispatcher
+
+
+def request_old(logger: logging.Logger):
+    request_id = uuid.uuid4().hex
+    logger.info(f'Начато выполнение запроса {request_id} по адресу /categories/. Метод запроса - GET')
+    logger.info(f'Запрос {request_id} выполнен за 0.001. Код ответа - 200. Занято соединений - 0 (sync), 1 (async)')
+
+
+def request_new(logger: logging.Logger):
+    request_id = uuid.uuid4().hex
+    logger.info(
+        'Начато выполнение запроса %s по адресу %s. Метод запроса - %s',
+        request_id, '/categories/', 'GET', extra={'request_id': request_id},
+    )
+    logger.info(
+        'Запрос %s выполнен за %s. Код ответа - %s. Занято соединений - %s (sync), %s (async)',
+        request_id, 0.001, 200, 0, 1, extra={'request_id': request_id},
+    )
+
+
+def measure(request, logger: logging.Logger, count: int) -> list[float]:
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        request(logger)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)
+
+
+def report(name: str, timings: list[float]):
+    p99 = timings[int(len(timings) * 0.99)]
+    print(
+        f'{name:<32} p50 {median(timings) * 1e6:>8.1f} мкс    p99 {p99 * 1e6:>8.1f} мкс    '
+        f'max {timings[-1] * 1e3:>8.2f} мс'
+    )
+
+
+def main(count: int, stall: float):
+    logging.getLogger().setLevel(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        logger = sync_logger(os.path.join(directory, 'sync.log'), stall)
+        report('FileHandler (прежняя схема)', measure(request_old, logger, count))
+        for rate in (1, 0.1):
+            logger, dispatcher = queue_logger(os.path.join(directory, f'queue_{rate}.log'), stall, rate)
+            report(f'очередь, выборка {rate:.0%}', measure(request_new, logger, count))
+            dispatcher.stop()
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000,
+    )
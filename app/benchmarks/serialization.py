@@ -0,0 +1,65 @@
+"""
+Микробенчмарк сериализации ответов: прежний путь FastAPI (валидация response_model + jsonable_encoder + JSONResponse)
+против предкомпилированных сериализаторов на orjson.
+Запуск из папки app: python -m benchmarks.serialization
+"""
+from datetime import datetime
+from decimal import Decimal
+from timeit import timeit
+from types import SimpleNamespace
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+from schemas.categories import Category, category_serializer
+from schemas.photos import Photo, photo_serializer
+from schemas.rooms import Room, room_serializer
+from schemas.sales import Sale, sale_serializer
+from schemas.tags import Tag, tag_serializer
+
+
+ROWS = 200
+REPEAT = 50
+
+
+def make_category(i: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=i, name=f'Категория {i}', description='Просторный номер с видом на море' * 5, price=Decimal('3999.50'),
+        prepayment_percent=25.0, refund_percent=10.0, rooms_count=5, floors=2, beds=3, square=115.0,
+        is_hidden=False, main_photo_path=f'/app/media/{i}.jpg', date_created=datetime.now(),
+    )
+
+
+def make_rows() -> dict:
+    categories = [make_category(i) for i in range(ROWS)]
+    return {
+        'GET /categories': (Category, category_serializer, categories),
+        'GET /rooms': (Room, room_serializer, [
+            SimpleNamespace(id=i, room_number=i, category=categories[i], date_created=datetime.now())
+            for i in range(ROWS)
+        ]),
+        'GET /sales': (Sale, sale_serializer, [
+            SimpleNamespace(
+                id=i, name=f'Скидка {i}', description='Скидка на весь май', discount=30.0, image_path='/app/media/s.jpg',
+                start_date=datetime.now(), end_date=datetime.now(), date_created=datetime.now(),
+            )
+            for i in range(ROWS)
+        ]),
+        'GET /photos': (Photo, photo_serializer, [
+            SimpleNamespace(id=i, category_id=i, order=1, path=f'/app/media/{i}.jpg') for i in range(ROWS)
+        ]),
+        'GET /tags': (Tag, tag_serializer, [SimpleNamespace(id=i, name=f'Тег {i}') for i in range(ROWS)]),
+    }
+
+
+def main():
+    print(f'{"эндпоинт":<20}{"до, мс":>12}{"после, мс":>12}{"ускорение":>12}')
+    for endpoint, (schema, serializer, rows) in make_rows().items():
+        before = timeit(
+            lambda: JSONResponse(jsonable_encoder(parse_obj_as(list[schema], rows))).body, number=REPEAT
+        ) / REPEAT * 1000
+        after = timeit(lambda: serializer.list_response(rows).body, number=REPEAT) / REPEAT * 1000
+        print(f'{endpoint:<20}{before:>12.3f}{after:>12.3f}{before / after:>11.1f}x')
+
+
+if __name__ == '__main__':
+    main()
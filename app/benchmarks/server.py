@@ -0,0 +1,106 @@
+"""
+Бенчмарк режимов запуска: прежний (python main.py - один процесс uvicorn с перезагрузкой)
+и боевой (python serve.py - предзагрузка приложения и воркеры по числу ядер).
+Для каждого режима нагрузка на GET /health/pool (не обращается к базе) в течение заданного времени,
+выводятся запросы в секунду и память каждого процесса: RSS и PSS (PSS делит общие страницы между процессами,
+поэтому показывает выигрыш от copy-on-write).
+Запуск из папки app (только Linux): python -m benchmarks.server [секунд] [одновременных соединений]
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import httpx
+from config import app_settings
+
+
+MODES = {
+    'main.py (reload)': [sys.executable, 'main.py'],
+    'serve.py': [sys.executable, 'serve.py'],
+}
+PATH = '/health/pool'
+
+
+def process_tree(pid: int) -> list[int]:
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as file:
+            children = [int(child) for child in file.read().split()]
+    except OSError:
+        return []
+    return [pid] + [descendant for child in children for descendant in process_tree(child)]
+
+
+def memory_kb(pid: int) -> tuple[int, int]:
+    """
+    RSS и PSS процесса в килобайтах
+    :param pid:
+    :return:
+    """
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                values[name] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if (await client.get(PATH)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError('Приложение не ответило')
+
+
+async def load(client: httpx.AsyncClient, duration: float, concurrency: int) -> float:
+    done = 0
+    stop_at = time.perf_counter() + duration
+
+    async def user():
+        nonlocal done
+        while time.perf_counter() < stop_at:
+            await client.get(PATH)
+            done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return done / (time.perf_counter() - started)
+
+
+async def measure(command: list[str], duration: float, concurrency: int):
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{app_settings.SERVER_PORT}', limits=limits) as client:
+            await wait_ready(client)
+            rps = await load(client, duration, concurrency)
+        memory = [(pid, *memory_kb(pid)) for pid in process_tree(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+    return rps, memory
+
+
+def main(duration: float, concurrency: int):
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        raise SystemExit('Бенчмарк использует /proc и работает только в Linux')
+    for name, command in MODES.items():
+        rps, memory = asyncio.run(measure(command, duration, concurrency))
+        print(f'{name}: {rps:.0f} запросов/с')
+        for pid, rss, pss in memory:
+            print(f'    pid {pid:<8} RSS {rss / 1024:>7.1f} МБ    PSS {pss / 1024:>7.1f} МБ')
+        print(f'    всего PSS {sum(pss for _, _, pss in memory) / 1024:.1f} МБ')
+
+
+if __name__ == '__main__':
+    main(
+        float(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 64,
+    )
@@ -0,0 +1,58 @@
+"""
+Бенчмарк запуска: время от старта процесса uvicorn до первого успешного ответа (GET /health/pool,
+эндпоинт не обращается к базе) и время импорта модулей приложения.
+Запуск из папки app: python -m benchmarks.startup [повторов]
+"""
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from statistics import median
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(timeout: float = 60) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/health/pool', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError('Приложение не ответило')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_time(statement: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', statement], check=True)
+    return time.perf_counter() - started
+
+
+def main(repeat: int):
+    results = {
+        'импорт main': [import_time('import main') for _ in range(repeat)],
+        'импорт main и создание приложения': [import_time('import main; main.create_app()') for _ in range(repeat)],
+        'до первого ответа': [time_to_first_request() for _ in range(repeat)],
+    }
+    for name, values in results.items():
+        print(f'{name:<40}{median(values) * 1000:>10.0f} мс (медиана из {repeat})')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
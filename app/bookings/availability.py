@@ -0,0 +1,110 @@
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Iterable, Sequence
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from catalog.index import VersionedIndex
+from catalog.version import CatalogVersion
+from bookings.models import RoomBooking
+from config import app_settings
+
+
+# версия бронирований, общая для воркеров на хосте (меняется при каждом бронировании и отмене)
+bookings_version = CatalogVersion(app_settings.BOOKINGS_VERSION_FILE)
+
+
+class RoomIntervals:
+    """
+    Интервалы бронирований одной комнаты, отсортированные по дате заезда, с префиксным максимумом дат выезда.
+    Пересечение с периодом [start, end) проверяется двоичным поиском: среди броней, начинающихся до end,
+    хотя бы одна должна заканчиваться позже start
+    """
+    __slots__ = ('intervals', 'starts', 'max_ends')
+
+    def __init__(self):
+        # (заезд, выезд, id брони)
+        self.intervals: list[tuple[date, date, int]] = []
+        self.starts: list[date] = []
+        self.max_ends: list[date] = []
+
+    def _rebuild(self):
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = []
+        current = None
+        for _, end, _ in self.intervals:
+            current = end if current is None or end > current else current
+            self.max_ends.append(current)
+
+    def add(self, start: date, end: date, booking_id: int):
+        insort(self.intervals, (start, end, booking_id))
+        self._rebuild()
+
+    def remove(self, booking_id: int):
+        self.intervals = [interval for interval in self.intervals if interval[2] != booking_id]
+        self._rebuild()
+
+    def overlaps(self, start: date, end: date) -> bool:
+        position = bisect_left(self.starts, end)
+        return position > 0 and self.max_ends[position - 1] > start
+
+
+class AvailabilityIndex(VersionedIndex):
+    """
+    Индекс бронирований по комнатам в памяти. Занятые на период комнаты находятся двоичным поиском
+    по интервалам каждой комнаты, без запроса к базе, пока версия бронирований не изменилась
+    """
+    version_source = bookings_version
+
+    def __init__(self):
+        super().__init__()
+        self._rooms: dict[int, RoomIntervals] = {}
+        self._bookings: dict[int, int] = {}
+
+    async def load(self, db: AsyncSession) -> Sequence:
+        # прошедшие брони не влияют на поиск свободных комнат
+        query = select(RoomBooking.id, RoomBooking.room_id, RoomBooking.date_start, RoomBooking.date_end)
+        return (await db.execute(query.where(RoomBooking.date_end > date.today()))).all()
+
+    def _add(self, booking_id: int, room_id: int, start: date, end: date):
+        self._rooms.setdefault(room_id, RoomIntervals()).add(start, end, booking_id)
+        self._bookings[booking_id] = room_id
+
+    def _remove(self, booking_id: int):
+        room_id = self._bookings.pop(booking_id, None)
+        if room_id is not None:
+            self._rooms[room_id].remove(booking_id)
+
+    def build(self, bookings: Iterable, version: str):
+        with self._lock:
+            self._rooms, self._bookings = {}, {}
+            for booking_id, room_id, start, end in sorted(bookings, key=lambda booking: booking[2]):
+                rooms = self._rooms.setdefault(room_id, RoomIntervals())
+                rooms.intervals.append((start, end, booking_id))
+                self._bookings[booking_id] = room_id
+            for rooms in self._rooms.values():
+                rooms.intervals.sort()
+                rooms._rebuild()
+            self.version = version
+
+    def on_change(self, previous: str | None, version: str, booking: RoomBooking | None = None,
+                  cancelled_booking_id: int | None = None, **changes):
+        def change():
+            if booking is not None:
+                self._add(booking.id, booking.room_id, booking.date_start, booking.date_end)
+            if cancelled_booking_id is not None:
+                self._remove(cancelled_booking_id)
+
+        self._apply(previous, version, change)
+
+    def busy_rooms(self, start: date, end: date) -> set[int]:
+        """
+        Комнаты, занятые хотя бы в один день периода
+        :param start: дата заезда
+        :param end: дата выезда
+        :return: идентификаторы комнат
+        """
+        with self._lock:
+            return {room_id for room_id, rooms in self._rooms.items() if rooms.overlaps(start, end)}
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,18 @@
+from bookings.availability import bookings_version, availability_index
+
+
+# индексы бронирований в памяти, которые обновляются инкрементально при изменениях в этом воркере
+indexes = [availability_index]
+
+
+def bookings_changed(**changes):
+    """
+    Фиксация изменения бронирований: смена версии (индексы других воркеров перестроятся из базы)
+    и инкрементальное обновление индексов текущего воркера
+    :param changes: описание изменения, например booking - созданная бронь,
+    cancelled_booking_id - идентификатор отмененной брони
+    :return:
+    """
+    previous, version = bookings_version.bump()
+    for index in indexes:
+        index.on_change(previous, version, **changes)
@@ -0,0 +1,32 @@
+from datetime import date, datetime
+from sqlalchemy import CheckConstraint, Computed, Date, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import DATERANGE, ExcludeConstraint, Range
+from sqlalchemy.orm import Mapped, mapped_column
+from hotel_business_module.models.base import Base
+from hotel_business_module.models.rooms import Room as DbRoom
+from hotel_business_module.models.users import Client as DbClient
+
+
+class RoomBooking(Base):
+    """
+    Бронирование комнаты на период [date_start, date_end): дата выезда в период не входит,
+    поэтому выезд одного гостя и заезд следующего в один день не пересекаются
+    """
+    __tablename__ = 'room_booking'
+    REPR_MODEL_NAME = 'бронирование'
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    room_id: Mapped[int] = mapped_column(ForeignKey(DbRoom.__table__.c.id, ondelete='CASCADE'))
+    client_id: Mapped[int | None] = mapped_column(ForeignKey(DbClient.__table__.c.id, ondelete='SET NULL'))
+    date_start: Mapped[date] = mapped_column(Date)
+    date_end: Mapped[date] = mapped_column(Date)
+    # период бронирования диапазонным типом, по нему работает GiST индекс пересечений
+    during: Mapped[Range[date]] = mapped_column(DATERANGE, Computed("daterange(date_start, date_end, '[)')", persisted=True))
+    date_created: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        CheckConstraint('date_end > date_start', name='room_booking_dates_check'),
+        # последняя защита от двойного бронирования: периоды одной комнаты не пересекаются.
+        # GiST индекс ограничения (room_id через расширение btree_gist) служит и для поиска пересечений
+        ExcludeConstraint(('room_id', '='), ('during', '&&'), name='room_booking_no_overlap', using='gist'),
+    )
@@ -0,0 +1,63 @@
+"""
+Подготовка базы перед запуском приложения: расширения Postgres, таблицы и индексы.
+Выполняется один раз при развертывании (а не при импорте приложения в каждом воркере)
+и повторяет попытки, пока база недоступна.
+Запуск из папки app: python bootstrap.py
+"""
+import logging
+import sys
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from hotel_business_module.models.base import Base
+# все таблицы и индексы приложения регистрируются в метаданных при импорте
+import indexes
+from database import engine
+from logger_conf import configure_logging
+from config import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+# расширения для индексов бронирований (btree_gist) и поиска с опечатками (pg_trgm)
+EXTENSIONS = ('btree_gist', 'pg_trgm')
+
+
+def create_indexes(connection):
+    """
+    Создание объявленных индексов, которых нет в базе. create_all создает индексы только вместе с новыми
+    таблицами, поэтому индексы, добавленные к уже существующим таблицам, создаются здесь
+    :param connection:
+    :return:
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            index.create(connection, checkfirst=True)
+
+
+def bootstrap():
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            for extension in EXTENSIONS:
+                connection.execute(text(f'CREATE EXTENSION IF NOT EXISTS {extension}'))
+        Base.metadata.create_all(connection)
+        create_indexes(connection)
+
+
+def main() -> int:
+    configure_logging()
+    for attempt in range(1, app_settings.BOOTSTRAP_ATTEMPTS + 1):
+        try:
+            bootstrap()
+        except OperationalError as err:
+            logger.warning(f'База недоступна, попытка {attempt} из {app_settings.BOOTSTRAP_ATTEMPTS}. {str(err)}')
+            time.sleep(app_settings.BOOTSTRAP_RETRY_DELAY)
+            continue
+        logger.info('Схема базы подготовлена')
+        return 0
+    logger.error('Не удалось подготовить схему базы')
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
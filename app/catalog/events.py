@@ -0,0 +1,25 @@
+from catalog.version import catalog_version
+from catalog.similarity import similarity_index
+from catalog.snapshot import catalog_snapshot
+from catalog.prices import price_calendar
+from catalog.sales import sales_index
+from catalog.search import search_index
+
+
+# индексы каталога в памяти, которые обновляются инкрементально при изменениях в этом воркере
+indexes = [similarity_index, catalog_snapshot, price_calendar, sales_index, search_index]
+
+
+def catalog_changed(**changes):
+    """
+    Фиксация изменения каталога: смена версии (сбрасывает ETag и кэши во всех воркерах)
+    и инкрементальное обновление индексов текущего воркера
+    :param changes: описание изменения, например category - созданная или измененная категория,
+    removed_category_id - идентификатор удаленной категории, sale - созданная или измененная скидка,
+    removed_sale_id - идентификатор удаленной скидки, linked_sale/unlinked_sale - привязка скидки к категории
+    (идентификатор категории, идентификатор скидки)
+    :return:
+    """
+    previous, version = catalog_version.bump()
+    for index in indexes:
+        index.on_change(previous, version, **changes)
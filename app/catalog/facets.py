@@ -0,0 +1,100 @@
+from datetime import date
+from typing import Iterable
+from sqlalchemy import func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from hotel_business_module.models.categories import Category as DbCategory
+from async_gateways import AsyncCategoriesGateway, CountsCache
+from catalog.snapshot import catalog_snapshot
+from catalog.prices import price_calendar
+from catalog.version import catalog_version
+from config import app_settings
+
+
+# фасеты панели фильтров: параметр фильтра -> (поле категории, ширина интервала или None для точных значений)
+FACETS = {
+    'beds': ('beds', None),
+    'floors': ('floors', None),
+    'rooms': ('rooms_count', None),
+    'price': ('price', app_settings.FACET_PRICE_STEP),
+    'square': ('square', app_settings.FACET_SQUARE_STEP),
+}
+
+facets_cache = CountsCache(ttl=app_settings.CATEGORIES_COUNT_CACHE_TTL)
+
+
+def facet_rows(step: int | None, counts: Iterable[tuple[float, int]]) -> list[dict]:
+    """
+    Строки гистограммы фасета
+    :param step: ширина интервала или None для точных значений
+    :param counts: значение (или начало интервала) и количество категорий
+    :return:
+    """
+    if step is None:
+        return [{'value': int(value), 'count': int(count)} for value, count in sorted(counts)]
+    return [{'from': int(value), 'until': int(value) + step, 'count': int(count)} for value, count in sorted(counts)]
+
+
+async def sql_histograms(filter: dict, db: AsyncSession) -> tuple[int, dict[str, list]]:
+    """
+    Гистограммы фасетов одним агрегирующим запросом с GROUPING SETS: по набору на каждое поле
+    :param filter: параметры фильтрации
+    :param db: асинхронная сессия sqlalchemy
+    :return: количество подходящих категорий и пары (значение или начало интервала, количество) по фасетам
+    """
+    columns = {}
+    for name, (field, step) in FACETS.items():
+        column = getattr(DbCategory, field)
+        if step is not None:
+            # шаг подставляется в текст запроса, чтобы выражения в SELECT и GROUPING SETS совпадали
+            width = literal_column(str(int(step)))
+            column = func.floor(column / width) * width
+        columns[name] = column.label(name)
+    if 'effective_price_from' in filter or 'effective_price_until' in filter:
+        raise ValueError('Фильтр по фактической цене доступен только при поиске по снимку каталога')
+    query = (
+        AsyncCategoriesGateway.build_filter_query(filter)
+        .with_only_columns(*columns.values(), func.count(DbCategory.id).label('count'))
+        .group_by(func.grouping_sets(*columns.values()))
+    )
+    counts = {name: [] for name in FACETS}
+    for row in await db.execute(query):
+        # в строке набора заполнено только сгруппированное поле, остальные - NULL
+        for name in FACETS:
+            value = getattr(row, name)
+            if value is not None:
+                counts[name].append((float(value), row.count))
+                break
+    return sum(count for _, count in counts['beds']), counts
+
+
+async def category_facets(filter: dict, db: AsyncSession) -> dict:
+    """
+    Количество категорий по значениям каждого фильтруемого поля среди категорий, подходящих под фильтр.
+    Результат кэшируется до изменения каталога
+    :param filter: параметры фильтрации
+    :param db: асинхронная сессия sqlalchemy
+    :return: общее количество и гистограммы по полям
+    """
+    key = (
+        catalog_version.current(),
+        # фильтр по фактической цене зависит от дня price_date (по умолчанию сегодня), который исключен
+        # из полей фильтра вместе с параметрами пагинации
+        filter.get('price_date', date.today()),
+        frozenset(
+            (field, value) for field, value in filter.items()
+            if field not in AsyncCategoriesGateway.PAGINATION_FIELDS
+        ),
+    )
+    facets = facets_cache.get(key)
+    if facets is None:
+        if app_settings.CATALOG_SNAPSHOT_ENABLED:
+            await catalog_snapshot.ensure(db)
+            await price_calendar.ensure(db)
+            total, histograms = catalog_snapshot.histograms(filter, FACETS)
+        else:
+            total, histograms = await sql_histograms(filter, db)
+        facets = {'total': total}
+        for name, (_, step) in FACETS.items():
+            facets[name] = facet_rows(step, histograms[name])
+        facets_cache.set(key, facets)
+    return facets
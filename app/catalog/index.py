@@ -0,0 +1,75 @@
+import threading
+from typing import Callable, Sequence
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from hotel_business_module.models.categories import Category as DbCategory
+from catalog.version import catalog_version
+
+
+class VersionedIndex:
+    """
+    Базовый класс индекса каталога в памяти, привязанного к версии каталога.
+    Изменения в текущем воркере применяются инкрементально, а если версия индекса не совпадает
+    с версией каталога перед изменением (каталог менялся в другом воркере), индекс перестраивается из базы
+    """
+    # источник версии данных индекса
+    version_source = catalog_version
+
+    def __init__(self):
+        self.version: str | None = None
+        self._lock = threading.RLock()
+
+    async def load(self, db: AsyncSession) -> Sequence:
+        """
+        Загрузка данных для полного построения индекса
+        :param db: асинхронная сессия sqlalchemy
+        :return:
+        """
+        return (await db.scalars(select(DbCategory))).all()
+
+    def build(self, data: Sequence, version: str):
+        """
+        Полное построение индекса
+        :param data: данные, полученные в load
+        :param version: версия каталога, которой соответствуют данные
+        :return:
+        """
+        raise NotImplementedError
+
+    async def ensure(self, db: AsyncSession):
+        """
+        Перестроение индекса, если каталог изменился с момента его построения
+        :param db: асинхронная сессия sqlalchemy
+        :return:
+        """
+        version = self.version_source.current()
+        if self.version == version:
+            return
+        self.build(await self.load(db), version)
+
+    def _apply(self, previous: str | None, version: str, change: Callable[[], None]) -> bool:
+        """
+        Применение инкрементального изменения
+        :param previous: версия каталога до изменения
+        :param version: версия каталога после изменения
+        :param change: функция, изменяющая индекс
+        :return: применено ли изменение
+        """
+        with self._lock:
+            if self.version is None or self.version != previous:
+                # пропущены чужие изменения - индекс перестроится при следующем обращении
+                self.version = None
+                return False
+            change()
+            self.version = version
+            return True
+
+    def on_change(self, previous: str | None, version: str, **changes):
+        """
+        Обработка изменения каталога. По умолчанию изменение не затрагивает индекс
+        :param previous: версия каталога до изменения
+        :param version: версия каталога после изменения
+        :param changes: описание изменения (см. catalog.events.catalog_changed)
+        :return:
+        """
+        self._apply(previous, version, lambda: None)
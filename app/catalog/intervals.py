@@ -0,0 +1,58 @@
+from typing import Any, Hashable, Iterator, Sequence
+
+
+class IntervalTree:
+    """
+    Статическое дерево отрезков [start, end] с включенными концами. Отрезки отсортированы по началу
+    и образуют неявное сбалансированное дерево поиска (корень поддерева - середина диапазона),
+    в каждом узле хранится наибольший конец в его поддереве. Поиск пересечений обходит только поддеревья,
+    которые могут их содержать: O(log n + k), где k - количество найденных отрезков
+    """
+    def __init__(self, intervals: Sequence[tuple[Any, Any, Hashable]]):
+        """
+        :param intervals: отрезки (начало, конец, ключ)
+        """
+        items = sorted(intervals, key=lambda interval: (interval[0], interval[1], interval[2]))
+        self._starts = [item[0] for item in items]
+        self._ends = [item[1] for item in items]
+        self._keys = [item[2] for item in items]
+        self._max_ends = list(self._ends)
+        self._augment(0, len(items) - 1)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _augment(self, lo: int, hi: int) -> Any:
+        if lo > hi:
+            return None
+        mid = (lo + hi) // 2
+        for child in (self._augment(lo, mid - 1), self._augment(mid + 1, hi)):
+            if child is not None and child > self._max_ends[mid]:
+                self._max_ends[mid] = child
+        return self._max_ends[mid]
+
+    def overlapping(self, start: Any, end: Any) -> Iterator[Hashable]:
+        """
+        Ключи отрезков, пересекающихся с [start, end], в порядке возрастания начала
+        :param start: начало
+        :param end: конец
+        :return:
+        """
+        stack = [(0, len(self._keys) - 1, False)]
+        while stack:
+            lo, hi, visited = stack.pop()
+            if lo > hi:
+                continue
+            mid = (lo + hi) // 2
+            if visited:
+                if self._ends[mid] >= start:
+                    yield self._keys[mid]
+                continue
+            if self._max_ends[mid] < start:
+                # все отрезки поддерева заканчиваются раньше начала периода
+                continue
+            # правое поддерево и сам узел нужны, только если узел начинается не позже конца периода
+            if self._starts[mid] <= end:
+                stack.append((mid + 1, hi, False))
+                stack.append((mid, mid, True))
+            stack.append((lo, mid - 1, False))
@@ -0,0 +1,195 @@
+from datetime import date, timedelta
+from typing import Sequence
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from hotel_business_module.models.categories import Category as DbCategory
+from hotel_business_module.models.sales import Sale as DbSale
+from catalog.index import VersionedIndex
+from loader_options import CATEGORY_SALES
+from config import app_settings
+
+
+class PriceCalendar(VersionedIndex):
+    """
+    Календарь фактических цен категорий на каждый день горизонта, начиная с сегодняшнего.
+    Скидки не суммируются: в день действует наибольшая из активных скидок категории.
+    Матрица скидок (категория x день) вычисляется векторно по интервалам скидок, а при изменении скидки
+    или ее привязки пересчитываются только строки затронутых категорий
+    """
+    def __init__(self, days: int):
+        super().__init__()
+        self.days = days
+        self._start = date.today()
+        self._rows: dict[int, int] = {}
+        self._ids = np.empty(0, dtype=np.int64)
+        self._base = np.empty(0)
+        self._discounts = np.empty((0, days))
+        self._prices = np.empty((0, days))
+        # скидки: id -> (первый день, последний день, процент), привязки: id категории -> id скидок
+        self._sales: dict[int, tuple[date, date, float]] = {}
+        self._links: dict[int, set[int]] = {}
+
+    async def load(self, db: AsyncSession) -> Sequence[DbCategory]:
+        return (await db.scalars(select(DbCategory).options(*CATEGORY_SALES))).all()
+
+    async def ensure(self, db: AsyncSession):
+        with self._lock:
+            if self._start != date.today():
+                # начался новый день - горизонт календаря сдвигается
+                self.version = None
+        await super().ensure(db)
+
+    @staticmethod
+    def _sale(sale: DbSale) -> tuple[date, date, float]:
+        return sale.start_date.date(), sale.end_date.date(), float(sale.discount)
+
+    def _discount_rows(self, category_ids: Sequence[int]) -> np.ndarray:
+        """
+        Наибольшая скидка каждой категории на каждый день горизонта
+        :param category_ids: идентификаторы категорий
+        :return: матрица скидок в процентах
+        """
+        discounts = np.zeros((len(category_ids), self.days))
+        links = [
+            (row, *self._sales[sale_id])
+            for row, category_id in enumerate(category_ids)
+            for sale_id in self._links.get(category_id, ())
+        ]
+        if links:
+            rows, starts, ends, percents = zip(*links)
+            start = np.datetime64(self._start)
+            starts = (np.array(starts, dtype='datetime64[D]') - start).astype(np.int64)
+            ends = (np.array(ends, dtype='datetime64[D]') - start).astype(np.int64)
+            days = np.arange(self.days)
+            # (привязка x день): действует ли скидка привязки в этот день
+            active = (days >= starts[:, None]) & (days <= ends[:, None])
+            np.maximum.at(discounts, np.array(rows), np.where(active, np.array(percents)[:, None], 0.0))
+        return discounts
+
+    def _recompute(self, rows: np.ndarray):
+        self._discounts[rows] = self._discount_rows(self._ids[rows].tolist())
+        self._prices[rows] = np.round(self._base[rows, None] * (1 - self._discounts[rows] / 100), 2)
+
+    def build(self, categories: Sequence[DbCategory], version: str):
+        with self._lock:
+            self._start = date.today()
+            self._sales = {sale.id: self._sale(sale) for category in categories for sale in category.sales}
+            self._links = {category.id: {sale.id for sale in category.sales} for category in categories}
+            self._ids = np.array([category.id for category in categories], dtype=np.int64)
+            self._rows = {category_id: row for row, category_id in enumerate(self._ids.tolist())}
+            self._base = np.array([float(category.price) for category in categories])
+            self._discounts = np.zeros((len(categories), self.days))
+            self._prices = np.zeros((len(categories), self.days))
+            self._recompute(np.arange(len(categories)))
+            self.version = version
+
+    def on_change(self, previous: str | None, version: str, category: DbCategory | None = None,
+                  removed_category_id: int | None = None, sale: DbSale | None = None,
+                  removed_sale_id: int | None = None, linked_sale: tuple[int, int] | None = None,
+                  unlinked_sale: tuple[int, int] | None = None, **changes):
+        """
+        Обработка изменения каталога
+        :param previous: версия каталога до изменения
+        :param version: версия каталога после изменения
+        :param category: созданная или измененная категория
+        :param removed_category_id: идентификатор удаленной категории
+        :param sale: созданная или измененная скидка
+        :param removed_sale_id: идентификатор удаленной скидки
+        :param linked_sale: (идентификатор категории, идентификатор скидки) - скидка привязана к категории
+        :param unlinked_sale: (идентификатор категории, идентификатор скидки) - скидка отвязана от категории
+        :return:
+        """
+        def change():
+            affected = set()
+            if category is not None:
+                if category.id in self._rows:
+                    self._base[self._rows[category.id]] = float(category.price)
+                else:
+                    self._append(category.id, float(category.price))
+                affected.add(category.id)
+            if removed_category_id is not None:
+                self._drop(removed_category_id)
+            if sale is not None:
+                self._sales[sale.id] = self._sale(sale)
+                affected |= {category_id for category_id, sales in self._links.items() if sale.id in sales}
+            if removed_sale_id is not None:
+                self._sales.pop(removed_sale_id, None)
+                for category_id, sales in self._links.items():
+                    if removed_sale_id in sales:
+                        sales.discard(removed_sale_id)
+                        affected.add(category_id)
+            if linked_sale is not None:
+                self._links.setdefault(linked_sale[0], set()).add(linked_sale[1])
+                affected.add(linked_sale[0])
+            if unlinked_sale is not None:
+                self._links.get(unlinked_sale[0], set()).discard(unlinked_sale[1])
+                affected.add(unlinked_sale[0])
+            rows = [self._rows[category_id] for category_id in affected if category_id in self._rows]
+            if rows:
+                self._recompute(np.array(rows))
+
+        self._apply(previous, version, change)
+
+    def _append(self, category_id: int, price: float):
+        self._rows[category_id] = len(self._ids)
+        self._ids = np.append(self._ids, category_id)
+        self._base = np.append(self._base, price)
+        self._discounts = np.vstack([self._discounts, np.zeros((1, self.days))])
+        self._prices = np.vstack([self._prices, np.zeros((1, self.days))])
+
+    def _drop(self, category_id: int):
+        row = self._rows.pop(category_id, None)
+        if row is None:
+            return
+        self._links.pop(category_id, None)
+        self._ids = np.delete(self._ids, row)
+        self._base = np.delete(self._base, row)
+        self._discounts = np.delete(self._discounts, row, axis=0)
+        self._prices = np.delete(self._prices, row, axis=0)
+        self._rows = {category_id: row for row, category_id in enumerate(self._ids.tolist())}
+
+    def _day(self, day: date) -> int:
+        offset = (day - self._start).days
+        if not 0 <= offset < self.days:
+            last_day = self._start + timedelta(days=self.days - 1)
+            raise ValueError(f'Цены рассчитаны только на период с {self._start} по {last_day}')
+        return offset
+
+    def prices_on(self, category_ids: np.ndarray, day: date) -> np.ndarray:
+        """
+        Фактические цены категорий в заданный день
+        :param category_ids: идентификаторы категорий
+        :param day: день
+        :return: цены в порядке идентификаторов (nan для неизвестных категорий)
+        """
+        with self._lock:
+            offset = self._day(day)
+            rows = np.array([self._rows.get(category_id, -1) for category_id in category_ids.tolist()], dtype=np.int64)
+            prices = self._prices[rows, offset] if len(self._ids) else np.full(len(rows), np.nan)
+            return np.where(rows >= 0, prices, np.nan)
+
+    def calendar(self, category_id: int, date_from: date, date_to: date) -> list[dict] | None:
+        """
+        Календарь цен категории
+        :param category_id: идентификатор категории
+        :param date_from: первый день
+        :param date_to: последний день (включительно)
+        :return: цена и скидка на каждый день или None, если категории нет
+        """
+        if date_to < date_from:
+            raise ValueError('Дата окончания периода должна быть не раньше даты начала')
+        with self._lock:
+            first, last = self._day(date_from), self._day(date_to)
+            row = self._rows.get(category_id)
+            if row is None:
+                return None
+            return [
+                {'date': date_from + timedelta(days=offset), 'price': price, 'discount': discount}
+                for offset, (price, discount) in enumerate(zip(
+                    self._prices[row, first:last + 1].tolist(), self._discounts[row, first:last + 1].tolist(),
+                ))
+            ]
+
+
+price_calendar = PriceCalendar(app_settings.PRICE_CALENDAR_DAYS)
@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Sequence
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from hotel_business_module.models.sales import Sale as DbSale
+from schemas.sales import sale_serializer
+from catalog.index import VersionedIndex
+from catalog.intervals import IntervalTree
+
+
+class SalesIndex(VersionedIndex):
+    """
+    Скидки по периодам действия. Поиск действующих скидок идет по дереву отрезков,
+    поэтому его стоимость зависит от количества найденных скидок, а не от всей истории скидок
+    """
+    def __init__(self):
+        super().__init__()
+        self._sales: dict[int, dict] = {}
+        self._tree = IntervalTree([])
+
+    async def load(self, db: AsyncSession) -> Sequence[DbSale]:
+        return (await db.scalars(select(DbSale))).all()
+
+    def _rebuild_tree(self):
+        self._tree = IntervalTree([(sale['start_date'], sale['end_date'], sale_id) for sale_id, sale in self._sales.items()])
+
+    def build(self, sales: Sequence[DbSale], version: str):
+        with self._lock:
+            self._sales = {sale.id: sale_serializer.to_dict(sale) for sale in sales}
+            self._rebuild_tree()
+            self.version = version
+
+    def on_change(self, previous: str | None, version: str, sale: DbSale | None = None,
+                  removed_sale_id: int | None = None, **changes):
+        def change():
+            if sale is not None:
+                self._sales[sale.id] = sale_serializer.to_dict(sale)
+            if removed_sale_id is not None:
+                self._sales.pop(removed_sale_id, None)
+            if sale is not None or removed_sale_id is not None:
+                self._rebuild_tree()
+
+        self._apply(previous, version, change)
+
+    def overlapping(self, start: datetime, end: datetime) -> list[dict]:
+        """
+        Скидки, действующие хотя бы в один момент периода [start, end]
+        :param start: начало периода
+        :param end: конец периода
+        :return: сериализованные скидки в порядке начала действия
+        """
+        if end < start:
+            raise ValueError('Конец периода должен быть не раньше его начала')
+        with self._lock:
+            return [self._sales[sale_id] for sale_id in self._tree.overlapping(start, end)]
+
+
+sales_index = SalesIndex()
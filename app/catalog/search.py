@@ -0,0 +1,148 @@
+import math
+import re
+from collections import defaultdict
+from typing import Iterable, Sequence
+from hotel_business_module.models.categories import Category as DbCategory
+from catalog.index import VersionedIndex
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token: str) -> set[str]:
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_one_edit(first: str, second: str) -> bool:
+    """
+    Отличаются ли слова не больше чем на одну правку: вставку, удаление, замену
+    или перестановку соседних букв (частые опечатки, которые плохо ловятся триграммами коротких слов)
+    """
+    if abs(len(first) - len(second)) > 1:
+        return False
+    if len(first) > len(second):
+        first, second = second, first
+    prefix = 0
+    while prefix < len(first) and first[prefix] == second[prefix]:
+        prefix += 1
+    if len(first) < len(second):
+        return first[prefix:] == second[prefix + 1:]
+    return (
+        first[prefix + 1:] == second[prefix + 1:]
+        or first[prefix:prefix + 2] == second[prefix:prefix + 2][::-1] and first[prefix + 2:] == second[prefix + 2:]
+    )
+
+
+class SearchIndex(VersionedIndex):
+    """
+    Инвертированный индекс названий и описаний категорий для поиска без Postgres (например, на локальной
+    замене базы). Слова запроса сопоставляются со словарем индекса точно, по префиксу и по похожести триграмм,
+    поэтому поиск устойчив к опечаткам и окончаниям. Совпадения в названии весят больше, чем в описании
+    """
+    FIELD_WEIGHTS = {'name': 1.0, 'description': 0.4}
+    # минимальная похожесть слова по триграммам (как pg_trgm.similarity_threshold)
+    SIMILARITY_THRESHOLD = 0.3
+    MIN_PREFIX = 3
+    # минимальная длина слова, для которого допускается одна опечатка
+    MIN_TYPO_LENGTH = 4
+
+    def __init__(self):
+        super().__init__()
+        # слово -> {id категории: вес вхождений}
+        self._postings: dict[str, dict[int, float]] = {}
+        # триграмма -> слова словаря
+        self._trigrams: dict[str, set[str]] = {}
+        self._documents: dict[int, dict[str, float]] = {}
+
+    @classmethod
+    def _document(cls, category: DbCategory) -> dict[str, float]:
+        weights = defaultdict(float)
+        for field, weight in cls.FIELD_WEIGHTS.items():
+            for token in tokenize(getattr(category, field) or ''):
+                weights[token] += weight
+        return dict(weights)
+
+    def _add(self, category_id: int, document: dict[str, float]):
+        self._documents[category_id] = document
+        for token, weight in document.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                for trigram in trigrams(token):
+                    self._trigrams.setdefault(trigram, set()).add(token)
+            self._postings[token][category_id] = weight
+
+    def _remove(self, category_id: int):
+        for token in self._documents.pop(category_id, {}):
+            postings = self._postings[token]
+            postings.pop(category_id, None)
+            if not postings:
+                del self._postings[token]
+                for trigram in trigrams(token):
+                    self._trigrams[trigram].discard(token)
+
+    def build(self, categories: Sequence[DbCategory], version: str):
+        with self._lock:
+            self._postings, self._trigrams, self._documents = {}, {}, {}
+            for category in categories:
+                self._add(category.id, self._document(category))
+            self.version = version
+
+    def on_change(self, previous: str | None, version: str, category: DbCategory | None = None,
+                  removed_category_id: int | None = None, **changes):
+        def change():
+            if category is not None:
+                self._remove(category.id)
+                self._add(category.id, self._document(category))
+            if removed_category_id is not None:
+                self._remove(removed_category_id)
+
+        self._apply(previous, version, change)
+
+    def _matches(self, token: str) -> Iterable[tuple[str, float]]:
+        """
+        Слова словаря, подходящие под слово запроса, и степень совпадения
+        :param token: слово запроса
+        :return:
+        """
+        if token in self._postings:
+            yield token, 1.0
+        query_trigrams = trigrams(token)
+        candidates = set()
+        for trigram in query_trigrams:
+            candidates |= self._trigrams.get(trigram, set())
+        candidates.discard(token)
+        for candidate in candidates:
+            if len(token) >= self.MIN_PREFIX and candidate.startswith(token):
+                yield candidate, 0.8
+                continue
+            candidate_trigrams = trigrams(candidate)
+            similarity = len(query_trigrams & candidate_trigrams) / len(query_trigrams | candidate_trigrams)
+            if similarity >= self.SIMILARITY_THRESHOLD:
+                yield candidate, similarity * 0.6
+            elif len(token) >= self.MIN_TYPO_LENGTH and within_one_edit(token, candidate):
+                yield candidate, 0.5
+
+    def search(self, query: str) -> dict[int, float]:
+        """
+        Поиск категорий
+        :param query: поисковый запрос
+        :return: релевантность найденных категорий по их идентификаторам
+        """
+        scores = defaultdict(float)
+        with self._lock:
+            total = max(len(self._documents), 1)
+            for token in set(tokenize(query)):
+                for match, closeness in self._matches(token):
+                    postings = self._postings[match]
+                    idf = math.log(1 + total / len(postings))
+                    for category_id, weight in postings.items():
+                        scores[category_id] += closeness * idf * weight
+        return dict(scores)
+
+
+search_index = SearchIndex()
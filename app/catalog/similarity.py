@@ -0,0 +1,188 @@
+import numpy as np
+from hotel_business_module.models.categories import Category as DbCategory
+from schemas.categories import category_serializer
+from catalog.index import VersionedIndex
+from config import app_settings
+
+
+class SimilarityIndex(VersionedIndex):
+    """
+    Индекс похожих категорий. Числовые признаки категорий хранятся матрицей numpy, попарные расстояния
+    считаются одной векторной операцией, а ближайшие соседи каждой категории вычисляются заранее.
+    Поиск похожих категорий не выполняет SQL запросов, пока версия каталога не изменилась
+    """
+    FEATURES = ('beds', 'floors', 'square', 'price', 'rooms_count')
+
+    def __init__(self, k: int):
+        super().__init__()
+        self.k = k
+        self._ids = np.empty(0, dtype=np.int64)
+        self._features = np.empty((0, len(self.FEATURES)))
+        self._hidden = np.empty(0, dtype=bool)
+        self._scale = np.ones(len(self.FEATURES))
+        self._distances = np.empty((0, 0))
+        self._neighbours: dict[int, list[int]] = {}
+        self._categories: dict[int, dict] = {}
+
+    def _row(self, category: DbCategory) -> np.ndarray:
+        return np.array([float(getattr(category, feature)) for feature in self.FEATURES]) / self._scale
+
+    def _pairwise(self, features: np.ndarray) -> np.ndarray:
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab для всех пар сразу
+        squares = (features ** 2).sum(axis=1)
+        distances = squares[:, None] + squares[None, :] - 2 * features @ features.T
+        np.maximum(distances, 0, out=distances)
+        return distances
+
+    def _masked(self, distances: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # скрытые категории и сама категория не предлагаются как похожие
+        masked = distances.copy()
+        masked[:, self._hidden] = np.inf
+        masked[np.arange(len(rows)), rows] = np.inf
+        return masked
+
+    def _update_neighbours(self, rows: np.ndarray):
+        if len(rows) == 0:
+            return
+        masked = self._masked(self._distances[rows], rows)
+        k = min(self.k, len(self._ids) - 1)
+        if k <= 0:
+            for row in rows:
+                self._neighbours[int(self._ids[row])] = []
+            return
+        nearest = np.argpartition(masked, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(masked, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        nearest_distances = np.take_along_axis(nearest_distances, order, axis=1)
+        for row, neighbours, distances in zip(rows, nearest, nearest_distances):
+            self._neighbours[int(self._ids[row])] = [
+                int(self._ids[neighbour]) for neighbour, distance in zip(neighbours, distances) if np.isfinite(distance)
+            ]
+
+    def build(self, categories: list[DbCategory], version: str):
+        """
+        Полное построение индекса
+        :param categories: все категории
+        :param version: версия каталога, которой соответствуют категории
+        :return:
+        """
+        raw = np.array(
+            [[float(getattr(category, feature)) for feature in self.FEATURES] for category in categories]
+        ).reshape(len(categories), len(self.FEATURES))
+        with self._lock:
+            # нормируем признаки, чтобы цена не перевешивала количество кроватей
+            scale = raw.std(axis=0) if len(categories) else np.ones(len(self.FEATURES))
+            self._scale = np.where(scale > 0, scale, 1.0)
+            self._features = raw / self._scale
+            self._ids = np.array([category.id for category in categories], dtype=np.int64)
+            self._hidden = np.array([category.is_hidden for category in categories], dtype=bool)
+            self._categories = {category.id: category_serializer.to_dict(category) for category in categories}
+            self._distances = self._pairwise(self._features)
+            self._neighbours = {}
+            self._update_neighbours(np.arange(len(self._ids)))
+            self.version = version
+
+    def on_change(self, previous: str | None, version: str, category: DbCategory | None = None,
+                  removed_category_id: int | None = None, **kwargs):
+        """
+        Обработка изменения каталога
+        :param previous: версия каталога до изменения
+        :param version: версия каталога после изменения
+        :param category: созданная или измененная категория
+        :param removed_category_id: идентификатор удаленной категории
+        :return:
+        """
+        if category is not None:
+            self.upsert(category, previous, version)
+        elif removed_category_id is not None:
+            self.remove(removed_category_id, previous, version)
+        else:
+            # изменение не затрагивает признаки категорий
+            super().on_change(previous, version)
+
+    def upsert(self, category: DbCategory, previous: str | None, version: str):
+        """
+        Инкрементальное обновление индекса после создания, изменения или скрытия категории
+        :param category: категория
+        :param previous: версия каталога до изменения
+        :param version: версия каталога после изменения
+        :return:
+        """
+        def change():
+            row_features = self._row(category)
+            positions = np.flatnonzero(self._ids == category.id)
+            if len(positions):
+                row = int(positions[0])
+                old_neighbours_of = {
+                    other for other, neighbours in self._neighbours.items() if category.id in neighbours
+                }
+                self._features[row] = row_features
+                self._hidden[row] = category.is_hidden
+            else:
+                row = len(self._ids)
+                old_neighbours_of = set()
+                self._ids = np.append(self._ids, category.id)
+                self._features = np.vstack([self._features, row_features])
+                self._hidden = np.append(self._hidden, category.is_hidden)
+                self._distances = np.pad(self._distances, ((0, 1), (0, 1)))
+            self._categories[category.id] = category_serializer.to_dict(category)
+
+            distances = ((self._features - row_features) ** 2).sum(axis=1)
+            self._distances[row, :] = distances
+            self._distances[:, row] = distances
+            # пересчитываем соседей только у категорий, для которых изменение могло что-то поменять
+            affected = {row}
+            for other_row, other_id in enumerate(self._ids.tolist()):
+                neighbours = self._neighbours.get(other_id, [])
+                if other_id in old_neighbours_of or len(neighbours) < self.k:
+                    affected.add(other_row)
+                elif not category.is_hidden:
+                    farthest = self._distances[other_row, np.flatnonzero(self._ids == neighbours[-1])[0]]
+                    if distances[other_row] < farthest:
+                        affected.add(other_row)
+            self._update_neighbours(np.array(sorted(affected)))
+
+        self._apply(previous, version, change)
+
+    def remove(self, category_id: int, previous: str | None, version: str):
+        """
+        Инкрементальное обновление индекса после удаления категории
+        :param category_id: идентификатор удаленной категории
+        :param previous: версия каталога до изменения
+        :param version: версия каталога после изменения
+        :return:
+        """
+        def change():
+            positions = np.flatnonzero(self._ids == category_id)
+            if not len(positions):
+                return
+            row = int(positions[0])
+            self._ids = np.delete(self._ids, row)
+            self._features = np.delete(self._features, row, axis=0)
+            self._hidden = np.delete(self._hidden, row)
+            self._distances = np.delete(np.delete(self._distances, row, axis=0), row, axis=1)
+            self._categories.pop(category_id, None)
+            self._neighbours.pop(category_id, None)
+            affected = [
+                int(np.flatnonzero(self._ids == other)[0])
+                for other, neighbours in self._neighbours.items() if category_id in neighbours
+            ]
+            self._update_neighbours(np.array(affected, dtype=np.int64))
+
+        self._apply(previous, version, change)
+
+    def familiar(self, category_id: int) -> list[dict] | None:
+        """
+        Похожие категории
+        :param category_id: идентификатор категории
+        :return: сериализованные похожие категории или None, если категории нет
+        """
+        with self._lock:
+            neighbours = self._neighbours.get(category_id)
+            if neighbours is None:
+                return None
+            return [self._categories[neighbour] for neighbour in neighbours]
+
+
+similarity_index = SimilarityIndex(k=app_settings.FAMILIAR_CATEGORIES_COUNT)
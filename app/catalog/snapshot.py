@@ -0,0 +1,185 @@
+import math
+from datetime import date
+import numpy as np
+from hotel_business_module.models.categories import Category as DbCategory
+from schemas.categories import category_serializer
+from catalog.index import VersionedIndex
+from catalog.prices import price_calendar
+from async_gateways import AsyncCategoriesGateway
+
+
+class CatalogSnapshot(VersionedIndex):
+    """
+    Колоночный снимок категорий в памяти. Каждое поле фильтрации хранится массивом numpy,
+    фильтры вычисляются булевыми масками, а для каждого поля сортировки заранее посчитана перестановка индексов,
+    поэтому поиск и пагинация выполняются без запросов к базе
+    """
+    # параметры фильтра диапазонами и соответствующие им поля категории
+    RANGE_FIELDS = {
+        'beds': 'beds',
+        'floors': 'floors',
+        'square': 'square',
+        'price': 'price',
+        'rooms': 'rooms_count',
+    }
+    NUMERIC_FIELDS = ('beds', 'floors', 'square', 'price', 'rooms_count', 'prepayment_percent', 'refund_percent')
+    SORT_FIELDS = AsyncCategoriesGateway.SORT_FIELDS
+    # строки снимок упорядочивает по кодам символов, а база - по правилам сортировки колонки (collation),
+    # поэтому порядок по ним может расходиться с SQL путем и курсор по ним снимок не выдает
+    COLLATED_FIELDS = frozenset({'name'})
+    # фактическая цена со скидками на день price_date, берется из календаря цен
+    EFFECTIVE_PRICE = 'effective_price'
+
+    def __init__(self):
+        super().__init__()
+        self._rows: dict[int, dict] = {}
+        self._columns: dict[str, np.ndarray] = {}
+        self._orders: dict[str, np.ndarray] = {}
+        self._serialized: list[dict] = []
+
+    def _rebuild_columns(self):
+        rows = sorted(self._rows.values(), key=lambda row: row['id'])
+        columns = {
+            'id': np.array([row['id'] for row in rows], dtype=np.int64),
+            'is_hidden': np.array([row['is_hidden'] for row in rows], dtype=bool),
+            'name': np.array([row['name'] for row in rows], dtype=str),
+            'name_lower': np.array([row['name'].lower() for row in rows], dtype=str),
+            'date_created': np.array([row['date_created'] for row in rows], dtype='datetime64[us]'),
+        }
+        for field in self.NUMERIC_FIELDS:
+            columns[field] = np.array([float(row[field]) for row in rows], dtype=np.float64)
+        # перестановки по возрастанию поля, при равенстве - по id, как в SQL запросе
+        orders = {field: np.lexsort((columns['id'], columns[field])) for field in self.SORT_FIELDS}
+        self._columns, self._orders, self._serialized = columns, orders, rows
+
+    def build(self, categories: list[DbCategory], version: str):
+        rows = {category.id: category_serializer.to_dict(category) for category in categories}
+        with self._lock:
+            self._rows = rows
+            self._rebuild_columns()
+            self.version = version
+
+    def on_change(self, previous: str | None, version: str, category: DbCategory | None = None,
+                  removed_category_id: int | None = None, **changes):
+        def change():
+            if category is not None:
+                self._rows[category.id] = category_serializer.to_dict(category)
+            if removed_category_id is not None:
+                self._rows.pop(removed_category_id, None)
+            if category is not None or removed_category_id is not None:
+                self._rebuild_columns()
+
+        self._apply(previous, version, change)
+
+    def mask(self, filter: dict, effective_prices: np.ndarray | None = None) -> np.ndarray:
+        """
+        Булева маска категорий, подходящих под фильтр
+        :param filter: параметры фильтрации
+        :param effective_prices: фактические цены категорий, если фильтр по ним задан
+        :return:
+        """
+        columns = self._columns
+        mask = np.ones(len(columns['id']), dtype=bool)
+        if not filter.get('show_hidden', False):
+            mask &= ~columns['is_hidden']
+        if 'id' in filter:
+            mask &= columns['id'] == filter['id']
+        if 'name' in filter:
+            mask &= np.char.find(columns['name_lower'], filter['name'].lower()) >= 0
+        for param, field in self.RANGE_FIELDS.items():
+            if f'{param}_from' in filter:
+                mask &= columns[field] >= filter[f'{param}_from']
+            if f'{param}_until' in filter:
+                mask &= columns[field] <= filter[f'{param}_until']
+        if effective_prices is not None:
+            if f'{self.EFFECTIVE_PRICE}_from' in filter:
+                mask &= effective_prices >= filter[f'{self.EFFECTIVE_PRICE}_from']
+            if f'{self.EFFECTIVE_PRICE}_until' in filter:
+                mask &= effective_prices <= filter[f'{self.EFFECTIVE_PRICE}_until']
+        return mask
+
+    def _effective_prices(self, filter: dict) -> np.ndarray | None:
+        """
+        Фактические цены категорий на день price_date, если они нужны для сортировки или фильтра
+        :param filter: параметры фильтрации
+        :return:
+        """
+        uses_effective_price = filter.get('sort_by') == self.EFFECTIVE_PRICE or any(
+            f'{self.EFFECTIVE_PRICE}_{bound}' in filter for bound in ('from', 'until')
+        )
+        if not uses_effective_price:
+            return None
+        return price_calendar.prices_on(self._columns['id'], filter.get('price_date', date.today()))
+
+    def filter(self, filter: dict) -> tuple[list[dict], int, str | None]:
+        """
+        Поиск категорий по снимку
+        :param filter: параметры фильтрации (как у AsyncCategoriesGateway.filter, без курсора after)
+        :return: сериализованные категории страницы, количество страниц и курсор следующей страницы
+        """
+        sort_by, desc = filter.get('sort_by', 'id'), filter.get('desc', False)
+        if sort_by not in self.SORT_FIELDS and sort_by != self.EFFECTIVE_PRICE:
+            raise ValueError(f'Сортировка по полю {sort_by} не поддерживается')
+        page_size = filter.get('page_size', 8)
+        if page_size < 1:
+            raise ValueError('Размер страницы должен быть больше нуля')
+
+        with self._lock:
+            effective_prices = self._effective_prices(filter)
+            if sort_by == self.EFFECTIVE_PRICE:
+                order = np.lexsort((self._columns['id'], effective_prices))
+            else:
+                order = self._orders[sort_by]
+            if desc:
+                order = order[::-1]
+            selected = order[self.mask(filter, effective_prices)[order]]
+            start = (max(filter.get('page', 1), 1) - 1) * page_size
+            page = selected[start:start + page_size]
+            items = [self._serialized[position] for position in page]
+        next_cursor = None
+        has_cursor = sort_by != self.EFFECTIVE_PRICE and sort_by not in self.COLLATED_FIELDS
+        if start + page_size < len(selected) and has_cursor:
+            # курсор совместим с SQL путем, следующие страницы можно запрашивать через after
+            last = items[-1]
+            next_cursor = AsyncCategoriesGateway.encode_cursor(last[sort_by], last['id'], sort_by, desc)
+        return items, math.ceil(len(selected) / page_size), next_cursor
+
+    def ranked(self, filter: dict, scores: dict[int, float]) -> tuple[list[dict], int]:
+        """
+        Страница найденных полнотекстовым поиском категорий, подходящих под фильтр, по убыванию релевантности
+        :param filter: параметры фильтрации (сортировка и курсор не используются)
+        :param scores: релевантность найденных категорий по их идентификаторам
+        :return: сериализованные категории страницы и количество страниц
+        """
+        page_size = filter.get('page_size', 8)
+        if page_size < 1:
+            raise ValueError('Размер страницы должен быть больше нуля')
+        with self._lock:
+            ids = self._columns['id']
+            relevance = np.array([scores.get(category_id, 0.0) for category_id in ids.tolist()])
+            positions = np.flatnonzero(self.mask(filter, self._effective_prices(filter)) & (relevance > 0))
+            # по убыванию релевантности, при равенстве - по id
+            positions = positions[np.lexsort((ids[positions], -relevance[positions]))]
+            start = (max(filter.get('page', 1), 1) - 1) * page_size
+            items = [self._serialized[position] for position in positions[start:start + page_size]]
+        return items, math.ceil(len(positions) / page_size)
+
+    def histograms(self, filter: dict, fields: dict[str, tuple[str, int | None]]) -> tuple[int, dict[str, list]]:
+        """
+        Гистограммы значений полей среди категорий, подходящих под фильтр, за один проход по маске
+        :param filter: параметры фильтрации
+        :param fields: название гистограммы -> (поле категории, ширина интервала или None для точных значений)
+        :return: количество подходящих категорий и пары (значение или начало интервала, количество) по гистограммам
+        """
+        with self._lock:
+            mask = self.mask(filter, self._effective_prices(filter))
+            histograms = {}
+            for name, (field, step) in fields.items():
+                values = self._columns[field][mask]
+                if step is not None:
+                    values = np.floor(values / step) * step
+                histograms[name] = list(zip(*np.unique(values, return_counts=True)))
+            return int(mask.sum()), histograms
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,66 @@
+import fcntl
+import os
+import threading
+import uuid
+from config import app_settings
+
+
+class CatalogVersion:
+    """
+    Версия каталога (категории, теги, скидки, фотографии), общая для всех воркеров на хосте.
+    Хранится в файле, который атомарно подменяется при каждом изменении каталога. Чтение версии
+    стоит одного вызова stat, содержимое файла перечитывается только после его подмены
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_key = None
+        self._value = ''
+
+    def current(self) -> str:
+        """
+        Текущая версия каталога
+        :return:
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self.bump()[1]
+        file_key = (stat.st_ino, stat.st_mtime_ns)
+        if file_key != self._file_key:
+            with self._lock:
+                with open(self.path) as file:
+                    self._value = file.read().strip()
+                self._file_key = file_key
+        return self._value
+
+    def bump(self) -> tuple[str | None, str]:
+        """
+        Смена версии каталога после его изменения. Смена выполняется под файловой блокировкой,
+        поэтому предыдущая версия точно соответствует состоянию каталога перед этим изменением
+        :return: предыдущая и новая версии
+        """
+        value = uuid.uuid4().hex
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}'
+        with open(f'{self.path}.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path) as file:
+                    previous = file.read().strip()
+            except FileNotFoundError:
+                previous = None
+            with open(tmp_path, 'w') as file:
+                file.write(value)
+            os.replace(tmp_path, self.path)
+        return previous, value
+
+catalog_version = CatalogVersion(app_settings.CATALOG_VERSION_FILE)
+
+
+def catalog_cache_headers(etag: str) -> dict:
+    """
+    Заголовки кэширования ответов каталога
+    :param etag: ETag ответа
+    :return:
+    """
+    return {'ETag': etag, 'Cache-Control': f'public, max-age={app_settings.CATALOG_CACHE_MAX_AGE}'}
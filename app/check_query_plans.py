@@ -0,0 +1,144 @@
+"""
+Проверка планов запросов каталога. В транзакции, которая в конце откатывается, таблица категорий
+заполняется большим набором данных, после чего для каждого поддерживаемого сочетания фильтра и сортировки
+публичного списка категорий (а также поиска и выборок по внешним ключам) выполняется EXPLAIN.
+Если в плане есть последовательный просмотр проверяемой таблицы, скрипт завершается с кодом 1,
+поэтому его можно запускать в сборке после изменения запросов или индексов.
+Запуск из папки app: python check_query_plans.py [количество категорий]
+"""
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Iterator
+from sqlalchemy import Select, func, inspect, insert, or_, select, text
+from sqlalchemy.orm import Session
+from hotel_business_module.models.base import Base
+from hotel_business_module.models.categories import Category as DbCategory
+from hotel_business_module.models.photos import Photo as DbPhoto
+from hotel_business_module.models.rooms import Room as DbRoom
+from async_gateways import AsyncCategoriesGateway
+from database import engine, session_factory
+from indexes import CATEGORY_DOCUMENT, SEARCH_CONFIG
+
+
+PAGE_SIZE = 8
+WORDS = ['люкс', 'стандарт', 'семейный', 'море', 'балкон', 'кухня', 'парк', 'терраса', 'джакузи', 'мансарда']
+
+
+def seed(db: Session, count: int):
+    random.seed(0)
+    now = datetime.now()
+    rows = [
+        {
+            'name': f'{random.choice(WORDS).capitalize()} {i}',
+            'description': ' '.join(random.choices(WORDS, k=12)),
+            'price': Decimal(random.randint(1000, 20000)),
+            'prepayment_percent': float(random.randint(1, 99)),
+            'refund_percent': float(random.randint(1, 99)),
+            'rooms_count': random.randint(1, 10),
+            'floors': random.randint(1, 3),
+            'beds': random.randint(1, 6),
+            'square': float(random.randint(21, 300)),
+            # большинство категорий открыты, как в реальном каталоге
+            'is_hidden': random.random() < 0.05,
+            'main_photo_path': f'/app/media/{i}.jpg',
+            'date_created': now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+    db.execute(insert(DbCategory), rows)
+    db.execute(text(f'ANALYZE {DbCategory.__tablename__}'))
+
+
+def catalog_queries() -> Iterator[tuple[str, Select]]:
+    """
+    Запросы страницы публичного списка категорий в том виде, в каком их строит AsyncCategoriesGateway.filter
+    :return: описание и запрос
+    """
+    ranges = {
+        'без фильтра': {},
+        'beds': {'beds_from': 3, 'beds_until': 3},
+        'floors': {'floors_from': 2, 'floors_until': 2},
+        'price': {'price_from': 5000, 'price_until': 5100},
+        'square': {'square_from': 100, 'square_until': 101},
+        'rooms': {'rooms_from': 9, 'rooms_until': 9},
+    }
+    for sort_by in sorted(AsyncCategoriesGateway.SORT_FIELDS):
+        for desc in (False, True):
+            for name, filter in ranges.items():
+                sort_column = getattr(DbCategory, sort_by)
+                query = AsyncCategoriesGateway.build_filter_query(filter)
+                if desc:
+                    query = query.order_by(sort_column.desc(), DbCategory.id.desc())
+                else:
+                    query = query.order_by(sort_column, DbCategory.id)
+                yield f'sort_by={sort_by} desc={desc} фильтр={name}', query.limit(PAGE_SIZE + 1)
+
+
+def other_queries() -> Iterator[tuple[str, Select]]:
+    """
+    Поиск и выборки по внешним ключам. Таблицы комнат и фотографий не заполняются, поэтому эти запросы
+    проверяются с enable_seqscan = off: последовательный просмотр останется в плане, только если индекса нет
+    :return: описание и запрос
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, 'балкон')
+    yield 'полнотекстовый поиск', select(DbCategory.id).where(CATEGORY_DOCUMENT.op('@@')(ts_query))
+    yield 'поиск с опечатками', select(DbCategory.id).where(or_(
+        DbCategory.name.op('%')('семеный'), DbCategory.description.op('%>')('семеный'),
+    ))
+    yield 'комнаты категории', select(DbRoom.id).where(DbRoom.category_id == 1)
+    yield 'фотографии категории', select(DbPhoto.id).where(DbPhoto.category_id == 1)
+
+
+def missing_indexes(db: Session) -> Iterator[str]:
+    """
+    Объявленные индексы, которых нет в базе (например, если схема не обновлена командой bootstrap.py)
+    :param db:
+    :return: имена индексов
+    """
+    inspector = inspect(db.connection())
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                yield index.name
+
+
+def seq_scans(plan: dict) -> Iterator[str]:
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan.get('Relation Name')
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
+
+
+def main(count: int) -> int:
+    failures = 0
+    with session_factory() as db:
+        # планы проверяются на схеме самой базы, поэтому сначала убеждаемся, что в ней есть все индексы
+        for name in missing_indexes(db):
+            failures += 1
+            print(f'{"НЕТ ИНДЕКСА":<24}{name}')
+        seed(db, count)
+        checks = [(*check, False) for check in catalog_queries()] + [(*check, True) for check in other_queries()]
+        for description, query, force_index in checks:
+            db.execute(text(f'SET LOCAL enable_seqscan = {"off" if force_index else "on"}'))
+            sql = str(query.compile(engine, compile_kwargs={'literal_binds': True}))
+            plan = db.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scans = list(seq_scans(plan[0]['Plan']))
+            status = 'OK' if not scans else f'SEQ SCAN {", ".join(scans)}'
+            failures += bool(scans)
+            print(f'{status:<24}{description}')
+        # тестовые данные не сохраняются
+        db.rollback()
+    print(f'отсутствующих индексов и запросов с последовательным просмотром: {failures}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
@@ -0,0 +1,99 @@
+import os
+import tempfile
+from pydantic import BaseSettings
+
+
+class AppSettings(BaseSettings):
+    """
+    Настройки уровня приложения, дополняющие hotel_business_module.settings.
+    Все значения можно переопределить переменными окружения с тем же именем
+    """
+    # кэш пользователей и их прав
+    USERS_CACHE_TTL: float = 60
+    USERS_CACHE_SIZE: int = 1024
+    # файл версии пользователей и прав, общий для воркеров на хосте: его смена сбрасывает кэши всех воркеров
+    USERS_VERSION_FILE: str = os.path.join(tempfile.gettempdir(), 'hotel_users_version')
+    # папка с файлами версий отдельных пользователей: изменение одного пользователя не сбрасывает записи остальных
+    USERS_VERSIONS_DIR: str = os.path.join(tempfile.gettempdir(), 'hotel_users_versions')
+
+    # пул соединений с базой (отдельно для синхронного и асинхронного движка каждого воркера)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # время жизни закэшированного количества категорий по фильтру
+    CATEGORIES_COUNT_CACHE_TTL: float = 30
+
+    # пагинация и потоковая выдача списков
+    LIST_DEFAULT_LIMIT: int = 100
+    LIST_MAX_LIMIT: int = 1000
+    STREAM_BATCH_SIZE: int = 500
+
+    # кэширование публичного каталога: файл с версией каталога (общий для воркеров) и время жизни в кэше клиента
+    CATALOG_VERSION_FILE: str = os.path.join(tempfile.gettempdir(), 'hotel_catalog_version')
+    CATALOG_CACHE_MAX_AGE: int = 30
+
+    # количество похожих категорий
+    FAMILIAR_CATEGORIES_COUNT: int = 4
+
+    # поиск категорий по колоночному снимку каталога в памяти вместо запросов к базе
+    CATALOG_SNAPSHOT_ENABLED: bool = True
+
+    # ширина интервалов фасетов цены и площади в панели фильтров категорий
+    FACET_PRICE_STEP: int = 1000
+    FACET_SQUARE_STEP: int = 10
+
+    # горизонт календаря фактических цен категорий в днях
+    PRICE_CALENDAR_DAYS: int = 365
+
+    # поиск действующих скидок по дереву отрезков в памяти вместо запроса к базе
+    SALES_INDEX_ENABLED: bool = True
+
+    # файл версии бронирований, общий для воркеров на хосте
+    BOOKINGS_VERSION_FILE: str = os.path.join(tempfile.gettempdir(), 'hotel_bookings_version')
+    # поиск свободных комнат по индексу бронирований в памяти вместо запроса с диапазонами дат
+    AVAILABILITY_INDEX_ENABLED: bool = True
+    # количество попыток бронирования при гонке за одну комнату
+    BOOKING_ATTEMPTS: int = 5
+
+    # попытки подготовки схемы базы командой bootstrap.py, пока база недоступна
+    BOOTSTRAP_ATTEMPTS: int = 30
+    BOOTSTRAP_RETRY_DELAY: float = 2
+
+    # боевой запуск командой serve.py: адрес, количество воркеров (0 - по числу доступных ядер),
+    # очередь входящих соединений, keep-alive и время на завершение начатых запросов при остановке
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEP_ALIVE: int = 5
+    SERVER_GRACEFUL_TIMEOUT: float = 30
+    # наибольшая пауза перед перезапуском воркеров, которые падают сразу после запуска
+    SERVER_RESTART_MAX_DELAY: float = 30
+
+    # логирование: уровень корневого логгера и уровни отдельных логгеров (JSON, например {"requests_logger": "WARNING"})
+    LOG_LEVEL: str = 'INFO'
+    LOG_LEVELS: dict[str, str] = {}
+    # ротация файлов логов: по размеру или, если задан LOG_ROTATE_WHEN (например midnight), по времени
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT: int = 5
+    LOG_ROTATE_WHEN: str = ''
+    # доля записываемых сообщений о запросах и sql (предупреждения и ошибки пишутся всегда)
+    LOG_REQUESTS_SAMPLE_RATE: float = 1
+    LOG_SQL_SAMPLE_RATE: float = 1
+
+    # метрики запросов: папка для снимков метрик воркеров (общая для воркеров на хосте), период записи снимка
+    # и границы интервалов гистограммы времени ответа в секундах
+    METRICS_DIR: str = os.path.join(tempfile.gettempdir(), 'hotel_metrics')
+    METRICS_FLUSH_INTERVAL: float = 5
+    METRICS_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    # постоянный токен сборщика метрик для /metrics и /health (пустой - доступ только по праву show_monitoring)
+    MONITORING_TOKEN: str = ''
+
+    # сколько раз один http запрос может выполнить одинаковый запрос к базе до предупреждения о проблеме N+1
+    SQL_REPEAT_THRESHOLD: int = 10
+
+
+app_settings = AppSettings()
@@ -0,0 +1,139 @@
+import threading
+from time import perf_counter
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from hotel_business_module.session.session import engine as base_engine
+from config import app_settings
+from sql_stats import track_queries
+
+
+class PoolStats:
+    """
+    Накопительная статистика получения соединений из пула
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, timed_out: bool):
+        """
+        Учет одной попытки получения соединения
+        :param wait: время ожидания соединения в секундах
+        :param timed_out: завершилась ли попытка таймаутом
+        :return:
+        """
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.timeouts,
+                'wait_avg_ms': self.wait_total / attempts * 1000 if attempts else 0.0,
+                'wait_max_ms': self.wait_max * 1000,
+            }
+
+
+class PoolStatsMixin:
+    """
+    Примесь к пулу sqlalchemy, замеряющая ожидание соединения
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(perf_counter() - start, timed_out=False)
+        return connection
+
+    def recreate(self):
+        # при dispose() движок пересоздает пул, статистику переносим в новый
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(PoolStatsMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+pool_options = {
+    'pool_size': app_settings.DB_POOL_SIZE,
+    'max_overflow': app_settings.DB_MAX_OVERFLOW,
+    'pool_timeout': app_settings.DB_POOL_TIMEOUT,
+    'pool_recycle': app_settings.DB_POOL_RECYCLE,
+    'pool_pre_ping': app_settings.DB_POOL_PRE_PING,
+}
+
+# движки к той же базе, что и движок из hotel_business_module, но с настраиваемым и наблюдаемым пулом
+engine = create_engine(base_engine.url, poolclass=InstrumentedQueuePool, **pool_options)
+session_factory = sessionmaker(bind=engine)
+
+# асинхронный драйвер для диалекта базы: postgres в работе, sqlite - локальная замена базы
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+async_engine = create_async_engine(
+    base_engine.url.set(drivername=ASYNC_DRIVERS[base_engine.dialect.name]),
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_options,
+)
+# объекты не сбрасываются после коммита, чтобы их можно было сериализовать без повторной загрузки
+async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# учет количества и времени запросов к базе в рамках http запроса
+track_queries(engine)
+track_queries(async_engine.sync_engine)
+
+
+def pool_status(db_engine: Engine) -> dict:
+    """
+    Текущее состояние пула соединений движка
+    :param db_engine: синхронный движок (для асинхронного - async_engine.sync_engine)
+    :return:
+    """
+    pool = db_engine.pool
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': pool._max_overflow,
+        **pool.stats.as_dict(),
+    }
+
+
+def pools_status() -> dict:
+    """
+    Состояние пулов синхронного и асинхронного движков
+    :return:
+    """
+    return {
+        'sync': pool_status(engine),
+        'async': pool_status(async_engine.sync_engine),
+    }
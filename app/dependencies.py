@@ -1,58 +1,179 @@
-from hotel_business_module.session.session import get_session
 from hotel_business_module.gateways.users_gateway import UsersGateway
-from fastapi import HTTPException, status, Depends, Security
+from fastapi import HTTPException, status, Depends, Security, Query, Request
 from fastapi.security import HTTPAuthorizationCredentials
 from utils import HTTPBearer401
 from hotel_business_module.settings import settings
 from typing import Annotated
 from sqlalchemy.orm import Session
-from schemas.users import User
+from database import session_factory, async_session
+from config import app_settings
+from catalog.version import catalog_version, catalog_cache_headers
+from users_cache import users_cache, CachedUser
+from datetime import date
+import hmac
 import jwt
 
 
+TOKEN_EXCEPTION = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail='Данные для входа не предоставлены или имеют неверную форму'
+)
+
+
 def get_db():
     """
     Зависимость для получения сессии sqlalchemy
     :return:
     """
-    db = get_session()
+    db = session_factory()
     try:
         yield db
     finally:
         db.close()
 
 
-def get_current_user(
-        db: Annotated[Session, Depends(get_db)],
-        credentials: Annotated[HTTPAuthorizationCredentials, Security(HTTPBearer401())],
+async def get_async_db():
+    """
+    Зависимость для получения асинхронной сессии sqlalchemy
+    :return:
+    """
+    async with async_session() as db:
+        yield db
+
+
+def list_params_dependency(
+        limit: int = Query(default=app_settings.LIST_DEFAULT_LIMIT, ge=1, le=app_settings.LIST_MAX_LIMIT),
+        offset: int = Query(default=0, ge=0),
+        stream: bool = False,
 ):
     """
-    Зависимость для получения текущего пользователя с помощью Bearer токена
-    :param db:
-    :param credentials:
+    Зависимость для получения параметров пагинации списков.
+    При stream=true список выдается целиком потоком NDJSON, limit и offset игнорируются
+    :param limit:
+    :param offset:
+    :param stream:
     :return:
     """
-    token_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail='Данные для входа не предоставлены или имеют неверную форму'
-    )
+    return {'limit': limit, 'offset': offset, 'stream': stream}
+
+
+def check_etag(request: Request, etag: str) -> str:
+    """
+    Ответ 304 без обращения к базе, если ETag клиента совпадает с текущим
+    :param request:
+    :param etag: текущий ETag
+    :return: текущий ETag
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        client_etags = {client_etag.strip().removeprefix('W/') for client_etag in if_none_match.split(',')}
+        if etag in client_etags or '*' in client_etags:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=catalog_cache_headers(etag))
+    return etag
+
 
+async def catalog_etag(request: Request) -> str:
+    """
+    Зависимость для условных запросов к каталогу. Если ETag клиента совпадает с текущей версией каталога,
+    сразу отвечает 304 без обращения к базе
+    :param request:
+    :return: ETag текущей версии каталога
+    """
+    return check_etag(request, f'"{catalog_version.current()}"')
+
+
+async def catalog_dated_etag(request: Request) -> str:
+    """
+    Зависимость для условных запросов к ответам каталога, зависящим от текущей даты (фактические цены,
+    действующие скидки). ETag включает дату, поэтому после полуночи клиент получает новые данные, а не 304
+    :param request:
+    :return: ETag текущей версии каталога на сегодня
+    """
+    return check_etag(request, f'"{catalog_version.current()}-{date.today().isoformat()}"')
+
+
+def load_user_entry(user_id: int, db: Session) -> CachedUser | None:
+    """
+    Получение пользователя и его разрешений через кэш. При промахе пользователь и его разрешения
+    загружаются из базы и сохраняются в кэш в отсоединенном от сессии виде
+    :param user_id: идентификатор пользователя
+    :param db: сессия sqlalchemy
+    :return: запись кэша или None, если пользователь не найден
+    """
+    entry = users_cache.get(user_id)
+    if entry is not None:
+        return entry
+
+    # версию читаем до загрузки: изменение, сохраненное во время загрузки, сменит ее и сбросит эту запись
+    version = users_cache.current_version(user_id)
+    db_user = UsersGateway.get_by_id(user_id, db)
+    if db_user is None:
+        return None
+    permissions = {permission.code for permission in UsersGateway.get_user_permissions(db_user, db)}
+    is_superuser = bool(getattr(db_user, 'is_superuser', False))
+    # отсоединяем пользователя, чтобы коммиты текущей сессии не сбрасывали его состояние в кэше
+    db.expunge(db_user)
+    return users_cache.set(user_id, db_user, permissions, is_superuser, version)
+
+
+def get_token_payload(
+        credentials: Annotated[HTTPAuthorizationCredentials, Security(HTTPBearer401())],
+) -> dict:
+    """
+    Зависимость для получения содержимого Bearer токена доступа
+    :param credentials:
+    :return:
+    """
     try:
         token = credentials.credentials
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
     except (jwt.exceptions.DecodeError, jwt.exceptions.ExpiredSignatureError):
-        raise token_exception
+        raise TOKEN_EXCEPTION
 
-    # TODO: заменить на scopes
-    if payload['is_refresh_token']:
-        raise token_exception
+    if payload.get('is_refresh_token', True):
+        raise TOKEN_EXCEPTION
+    return payload
 
-    # TODO: заменить на sub
-    current_user = UsersGateway.get_by_id(payload['id'], db)
-    if current_user is None:
-        raise token_exception
 
-    return current_user
+def token_user_id(payload: dict) -> int:
+    """
+    Идентификатор пользователя из содержимого токена
+    :param payload:
+    :return:
+    """
+    # старые токены не содержат sub, для них берем id
+    return int(payload['sub']) if 'sub' in payload else payload['id']
+
+
+def get_current_user_entry(
+        db: Annotated[Session, Depends(get_db)],
+        payload: Annotated[dict, Depends(get_token_payload)],
+):
+    """
+    Зависимость для получения записи кэша текущего пользователя с помощью Bearer токена
+    :param db:
+    :param payload:
+    :return:
+    """
+    entry = load_user_entry(token_user_id(payload), db)
+    if entry is None:
+        raise TOKEN_EXCEPTION
+
+    return entry
+
+
+def get_current_user(
+        db: Annotated[Session, Depends(get_db)],
+        entry: Annotated[CachedUser, Depends(get_current_user_entry)],
+):
+    """
+    Зависимость для получения текущего пользователя с помощью Bearer токена
+    :param db:
+    :param entry:
+    :return:
+    """
+    # присоединяем копию закэшированного пользователя к сессии запроса без обращения к базе
+    return db.merge(entry.user, load=False)
 
 
 class PermissionsDependency:
@@ -65,11 +186,46 @@ class PermissionsDependency:
     def __call__(
             self,
             db: Annotated[Session, Depends(get_db)],
-            current_user: Annotated[User, Depends(get_current_user)],
+            payload: Annotated[dict, Depends(get_token_payload)],
     ):
-        if not UsersGateway.can_actions(user=current_user, db=db, codes=self.required_permissions):
+        if 'scopes' in payload:
+            # пока версия пользователя не сменилась после выпуска токена, права в нем актуальны
+            # и проверка обходится без кэша и базы; иначе сверяем отпечаток прав с текущими правами
+            if payload.get('users_version') != users_cache.current_version(token_user_id(payload)):
+                entry = get_current_user_entry(db, payload)
+                if payload.get('permissions_version') != entry.permissions_version:
+                    # права в токене устарели - клиенту нужно обновить токен
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail='Права пользователя изменились, обновите токен доступа'
+                    )
+            allowed = payload.get('is_superuser', False) or set(payload['scopes']).issuperset(self.required_permissions)
+        else:
+            allowed = get_current_user_entry(db, payload).can_actions(self.required_permissions)
+
+        if not allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail='Недостаточно прав для совершения операции'
             )
         return True
+
+
+show_monitoring = PermissionsDependency(['show_monitoring'])
+
+
+def monitoring_access(
+        db: Annotated[Session, Depends(get_db)],
+        credentials: Annotated[HTTPAuthorizationCredentials, Security(HTTPBearer401())],
+):
+    """
+    Зависимость для доступа к служебным маршрутам (метрики, состояние пулов): сотрудник с правом show_monitoring
+    или сборщик метрик с постоянным токеном MONITORING_TOKEN, которому не нужно обновлять токен доступа
+    :param db:
+    :param credentials:
+    :return:
+    """
+    token = app_settings.MONITORING_TOKEN
+    if token and hmac.compare_digest(credentials.credentials.encode(), token.encode()):
+        return True
+    return show_monitoring(db, get_token_payload(credentials))
@@ -0,0 +1,87 @@
+"""
+Индексы таблиц бизнес-модуля, нужные запросам приложения. Индексы привязываются к таблицам
+метаданных Base при импорте модуля, поэтому создаются вместе с таблицами
+"""
+from sqlalchemy import Index, MetaData, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR, ExcludeConstraint
+# все модели импортируются, чтобы их таблицы и таблицы связей были в метаданных
+from hotel_business_module.models.base import Base
+from hotel_business_module.models.categories import Category as DbCategory
+from hotel_business_module.models.groups import Group as DbGroup
+from hotel_business_module.models.permissions import Permission as DbPermission
+from hotel_business_module.models.photos import Photo as DbPhoto
+from hotel_business_module.models.rooms import Room as DbRoom
+from hotel_business_module.models.sales import Sale as DbSale
+from hotel_business_module.models.tags import Tag as DbTag
+from hotel_business_module.models.users import Client as DbClient, Worker as DbWorker
+from bookings.models import RoomBooking
+
+
+# документ полнотекстового поиска категории: название важнее описания. Константы записаны текстом, а не параметрами,
+# чтобы выражение в запросе совпадало с выражением индекса
+category_table = DbCategory.__table__
+SEARCH_CONFIG = text("'russian'::regconfig")
+CATEGORY_DOCUMENT = func.setweight(
+    func.to_tsvector(SEARCH_CONFIG, category_table.c.name), text("'A'"), type_=TSVECTOR,
+).op('||', return_type=TSVECTOR)(
+    func.setweight(func.to_tsvector(SEARCH_CONFIG, category_table.c.description), text("'B'"), type_=TSVECTOR)
+)
+
+
+# поиск скидок, действующих в период: start_date <= конец периода и end_date >= начало периода
+SALE_DATES = Index('ix_sale_start_date_end_date', DbSale.start_date, DbSale.end_date)
+
+# полнотекстовый поиск по названию и описанию категорий
+CATEGORY_DOCUMENT_INDEX = Index('ix_category_document', CATEGORY_DOCUMENT, postgresql_using='gin')
+# поиск с опечатками по триграммам (расширение pg_trgm)
+CATEGORY_NAME_TRGM = Index(
+    'ix_category_name_trgm', DbCategory.name, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+)
+CATEGORY_DESCRIPTION_TRGM = Index(
+    'ix_category_description_trgm', DbCategory.description,
+    postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'},
+)
+
+# поля, по которым сортируется и фильтруется публичный список категорий (только открытые категории).
+# Частичные индексы (поле, id) WHERE is_hidden IS false отдают страницу в нужном порядке без сортировки всей таблицы
+# и обслуживают фильтры диапазонами по этому полю
+CATEGORY_SORT_FIELDS = (
+    'id', 'name', 'price', 'beds', 'floors', 'square', 'rooms_count',
+    'prepayment_percent', 'refund_percent', 'date_created',
+)
+CATEGORY_VISIBLE_INDEXES = [
+    Index(
+        f'ix_category_visible_{field}',
+        *([category_table.c.id] if field == 'id' else [category_table.c[field], category_table.c.id]),
+        postgresql_where=category_table.c.is_hidden.is_(False),
+    )
+    for field in CATEGORY_SORT_FIELDS
+]
+
+
+def foreign_key_indexes(metadata: MetaData) -> list[Index]:
+    """
+    Индексы на внешние ключи, которые не покрыты первичным ключом, другим индексом или ограничением
+    (room.category_id, photo.category_id, колонки таблиц связей многие-ко-многим и т.д.).
+    Без них соединения и каскадные удаления по ключу просматривают всю таблицу
+    :param metadata: метаданные моделей
+    :return: созданные индексы
+    """
+    created = []
+    for table in list(metadata.tables.values()):
+        covered = [table.primary_key.columns.keys()]
+        covered += [index.columns.keys() for index in table.indexes]
+        covered += [
+            constraint.columns.keys() for constraint in table.constraints
+            if isinstance(constraint, (UniqueConstraint, ExcludeConstraint))
+        ]
+        for foreign_key in table.foreign_key_constraints:
+            columns = foreign_key.columns.keys()
+            if any(existing[:len(columns)] == columns for existing in covered):
+                continue
+            created.append(Index(f'ix_{table.name}_{"_".join(columns)}', *foreign_key.columns))
+            covered.append(columns)
+    return created
+
+
+FOREIGN_KEY_INDEXES = foreign_key_indexes(Base.metadata)
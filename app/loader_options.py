@@ -0,0 +1,32 @@
+"""
+Опции загрузки связей для каждого ответа. Загружается ровно то, что нужно схеме ответа:
+selectinload - для коллекций и повторяющихся родителей в списках (один дополнительный запрос по набору id),
+joinedload - для единичного объекта, где join дешевле отдельного запроса
+"""
+from sqlalchemy.orm import selectinload, joinedload
+from hotel_business_module.models.categories import Category as DbCategory
+from hotel_business_module.models.groups import Group as DbGroup
+from hotel_business_module.models.rooms import Room as DbRoom
+from hotel_business_module.models.users import Worker as DbWorker
+
+
+# schemas.rooms.Room содержит категорию целиком. В списке много комнат одной категории,
+# поэтому категории грузятся одним запросом, а не повторяются в каждой строке join'а
+ROOMS_LIST = [selectinload(DbRoom.category)]
+ROOM_DETAIL = [joinedload(DbRoom.category)]
+
+CATEGORY_TAGS = [selectinload(DbCategory.tags)]
+CATEGORY_SALES = [selectinload(DbCategory.sales)]
+CATEGORY_PHOTOS = [selectinload(DbCategory.photos)]
+# категория комнат уже загружена, join по ней лишь связывает комнаты с ней без ленивой загрузки
+CATEGORY_ROOMS = [selectinload(DbCategory.rooms).joinedload(DbRoom.category)]
+# опции для агрегированного ответа категории по названию подресурса
+CATEGORY_INCLUDES = {
+    'tags': CATEGORY_TAGS,
+    'sales': CATEGORY_SALES,
+    'photos': CATEGORY_PHOTOS,
+    'rooms': CATEGORY_ROOMS,
+}
+
+WORKER_GROUPS = [selectinload(DbWorker.groups)]
+GROUP_PERMISSIONS = [selectinload(DbGroup.permissions)]
@@ -1,24 +1,73 @@
+import atexit
+import copy
+import logging.config
+import logging.handlers
 import os
-import pathlib
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+import orjson
+from config import app_settings
 
-# настраиваем пути логирования
-LOG_DIR = os.path.join(pathlib.Path().resolve(), 'logs')
-COMMON_LOG_FILE = '/app_logs.log'
-REQUESTS_LOG_FILE = '/requests.log'
-EMAIL_LOG_FILE = '/emails.log'
-COMMON_LOG_PATH = LOG_DIR + COMMON_LOG_FILE
-REQUESTS_LOG_PATH = LOG_DIR + REQUESTS_LOG_FILE
-EMAIL_LOG_PATH = LOG_DIR + EMAIL_LOG_FILE
-log_files = [COMMON_LOG_FILE, REQUESTS_LOG_FILE, EMAIL_LOG_FILE]
+# настраиваем пути логирования (папка и файлы создаются при настройке логирования, а не при импорте)
+LOG_DIR = os.path.join(os.getcwd(), 'logs')
+COMMON_LOG_PATH = os.path.join(LOG_DIR, 'app_logs.log')
+REQUESTS_LOG_PATH = os.path.join(LOG_DIR, 'requests.log')
+EMAIL_LOG_PATH = os.path.join(LOG_DIR, 'emails.log')
+SQL_LOG_PATH = os.path.join(LOG_DIR, 'sql.log')
 
-# создаем папку логирования, если нету
-if not os.path.exists(LOG_DIR):
-    os.mkdir(LOG_DIR)
+# стандартные атрибуты записи лога, все остальные (переданные через extra) попадают в JSON отдельными полями
+RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime'}
 
-# создаем файлы логирования, если нету
-for log_file in log_files:
-    if not os.path.exists(log_file):
-        f = open(log_file, 'w').close()
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирование записи лога в одну строку JSON
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только долю сообщений уровня ниже WARNING.
+    Ставится на логгер, поэтому отброшенные сообщения даже не форматируются
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def file_handler(filename: str) -> logging.Handler:
+    """
+    Файловый обработчик с ротацией по размеру или по времени (настройки LOG_*)
+    :param filename:
+    :return:
+    """
+    if app_settings.LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            filename, when=app_settings.LOG_ROTATE_WHEN, backupCount=app_settings.LOG_BACKUP_COUNT,
+            encoding='utf-8', delay=True,
+        )
+    return logging.handlers.RotatingFileHandler(
+        filename, maxBytes=app_settings.LOG_MAX_BYTES, backupCount=app_settings.LOG_BACKUP_COUNT,
+        encoding='utf-8', delay=True,
+    )
 
 
 LOGGING = {
@@ -28,16 +77,26 @@ LOGGING = {
         'base_format': {
             'format': '%(asctime)s [%(name)s] [%(levelname)s] %(message)s'
         },
-        'no_name_format': {
-            'format': '%(asctime)s [%(levelname)s] %(message)s'
+        'json_format': {
+            '()': JsonFormatter,
+        },
+    },
+    'filters': {
+        'requests_sampling': {
+            '()': SamplingFilter,
+            'rate': app_settings.LOG_REQUESTS_SAMPLE_RATE,
+        },
+        'sql_sampling': {
+            '()': SamplingFilter,
+            'rate': app_settings.LOG_SQL_SAMPLE_RATE,
         },
     },
     'handlers': {
         'to_file': {
             'level': 'WARNING',
-            'class': 'logging.FileHandler',
+            '()': file_handler,
             'filename': COMMON_LOG_PATH,
-            'formatter': 'base_format',
+            'formatter': 'json_format',
         },
         'to_console': {
             'level': 'DEBUG',
@@ -46,21 +105,27 @@ LOGGING = {
         },
         'requests_to_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            '()': file_handler,
             'filename': REQUESTS_LOG_PATH,
-            'formatter': 'no_name_format',
+            'formatter': 'json_format',
         },
         'emails_to_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            '()': file_handler,
             'filename': EMAIL_LOG_PATH,
-            'formatter': 'no_name_format',
-        }
+            'formatter': 'json_format',
+        },
+        'sql_to_file': {
+            'level': 'INFO',
+            '()': file_handler,
+            'filename': SQL_LOG_PATH,
+            'formatter': 'json_format',
+        },
     },
     'loggers': {
         '': {
             'handlers': ['to_file', 'to_console', ],
-            'level': 'INFO',
+            'level': app_settings.LOG_LEVEL,
             'propagate': True,
         },
         'routers.auth': {
@@ -70,6 +135,7 @@ LOGGING = {
         },
         'requests_logger': {
             'handlers': ['requests_to_file', ],
+            'filters': ['requests_sampling', ],
             'level': 'INFO',
             'propagate': False,
         },
@@ -77,6 +143,149 @@ LOGGING = {
             'handlers': ['emails_to_file', ],
             'level': 'DEBUG',
             'propagate': False,
-        }
+        },
+        # запросы sqlalchemy (уровень INFO включает запись каждого запроса)
+        'sqlalchemy.engine': {
+            'handlers': ['sql_to_file', ],
+            'filters': ['sql_sampling', ],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
+
+
+class QueueForwardHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик, который вместо записи кладет сообщение в очередь вместе с настоящим обработчиком.
+    Запись в файлы и консоль выполняет фоновый поток, поэтому логирование не блокирует цикл событий
+    """
+    def __init__(self, log_queue: queue.SimpleQueue, target: logging.Handler):
+        super().__init__(log_queue)
+        self.target = target
+        self.setLevel(target.level)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # в вызывающем потоке только подставляем аргументы в сообщение (они могут измениться позже),
+        # само форматирование и трассировку исключения оставляем фоновому потоку
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self.queue.put_nowait((self.target, record))
+
+
+class QueueDispatcher(logging.handlers.QueueListener):
+    """
+    Фоновый поток, передающий сообщения из очереди тем обработчикам, для которых они были поставлены
+    """
+    def __init__(self, log_queue: queue.SimpleQueue):
+        super().__init__(log_queue)
+
+    def handle(self, item: tuple[logging.Handler, logging.LogRecord]):
+        handler, record = item
+        handler.handle(record)
+
+    def restart(self):
+        """
+        Запуск нового потока с новой очередью в дочернем процессе после fork (потоки не наследуются).
+        Дочерний процесс пишет в собственные файлы логов: ротация одного файла несколькими процессами
+        теряет и перезаписывает сообщения
+        :return:
+        """
+        self.queue = queue.SimpleQueue()
+        self._thread = None
+        for handler in _forward_handlers:
+            handler.queue = self.queue
+            if isinstance(handler.target, logging.FileHandler):
+                use_process_file(handler.target)
+        self.start()
+
+
+def process_log_path(path: str, pid: int) -> str:
+    """
+    Путь к файлу лога отдельного процесса: logs/requests.log -> logs/requests.<pid>.log
+    :param path: общий путь к файлу лога
+    :param pid: идентификатор процесса
+    :return:
+    """
+    root, ext = os.path.splitext(path)
+    return f'{root}.{pid}{ext}'
+
+
+def use_process_file(handler: logging.FileHandler):
+    """
+    Переключение файлового обработчика на файл текущего процесса. Унаследованный от родителя файл
+    закрывается в этом процессе, новый откроется при первой записи
+    :param handler:
+    :return:
+    """
+    handler.acquire()
+    try:
+        if handler.stream is not None:
+            handler.stream.close()
+            handler.stream = None
+        path = getattr(handler, 'shared_filename', handler.baseFilename)
+        handler.shared_filename = path
+        handler.baseFilename = process_log_path(path, os.getpid())
+    finally:
+        handler.release()
+
+
+_configured = False
+_configure_lock = threading.Lock()
+_forward_handlers: list[QueueForwardHandler] = []
+_dispatcher: QueueDispatcher | None = None
+
+
+def _move_handlers_to_queue():
+    """
+    Замена обработчиков всех настроенных логгеров на постановку в общую очередь
+    :return:
+    """
+    global _dispatcher
+    _dispatcher = QueueDispatcher(queue.SimpleQueue())
+    forwards = {}
+    for name in LOGGING['loggers']:
+        logger = logging.getLogger(name or None)
+        for handler in list(logger.handlers):
+            if handler not in forwards:
+                forwards[handler] = QueueForwardHandler(_dispatcher.queue, handler)
+            logger.removeHandler(handler)
+            logger.addHandler(forwards[handler])
+    _forward_handlers.extend(forwards.values())
+    _dispatcher.start()
+    # при выходе дописываем очередь и закрываем файлы
+    atexit.register(shutdown_logging)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_dispatcher.restart)
+
+
+def configure_logging():
+    """
+    Настройка логирования. Выполняется один раз на процесс из точки входа (приложение, скрипты),
+    повторные вызовы ничего не делают. Файлы логов открываются при первой записи
+    :return:
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        os.makedirs(LOG_DIR, exist_ok=True)
+        logging.config.dictConfig(LOGGING)
+        for name, level in app_settings.LOG_LEVELS.items():
+            logging.getLogger(name).setLevel(level)
+        _move_handlers_to_queue()
+        _configured = True
+
+
+def shutdown_logging():
+    """
+    Запись оставшихся в очереди сообщений и остановка фонового потока.
+    Нужна процессам, завершающимся через os._exit (воркеры serve.py), где не выполняется atexit
+    :return:
+    """
+    if _dispatcher is not None and _dispatcher._thread is not None:
+        _dispatcher.stop()
@@ -1,23 +1,22 @@
-from time import time
-from fastapi import FastAPI, Request
+from importlib import import_module
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
-from routers import tags, rooms, categories, auth, clients, workers, groups, permissions, sales, photos
-from hotel_business_module.models.base import Base
-from hotel_business_module.session.session import engine
-from logger_conf import LOGGING as LOG_CONF
-import logging
-import uuid
+from serializers import FastJSONResponse
+from logger_conf import configure_logging
+from middleware import RequestLoggingMiddleware
+from metrics import MetricsMiddleware
 
 
-logging.config.dictConfig(LOG_CONF)
-logger = logging.getLogger('requests_logger')
+configure_logging()
 
-Base.metadata.create_all(engine)
-app = FastAPI()
-app.mount('/app/media', StaticFiles(directory='media'), name='media')
+# модули роутеров импортируются при создании приложения, а не при импорте main
+ROUTERS = (
+    'tags', 'rooms', 'categories', 'auth', 'clients', 'workers', 'groups', 'permissions', 'sales', 'photos',
+    'health', 'orders', 'metrics',
+)
 
 origins = [
     'http://localhost',
@@ -26,50 +25,43 @@ origins = [
     'http://192.168.1.63:8080',
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-@app.middleware('http')
-async def log_requests(request: Request, call_next):
+def create_app() -> FastAPI:
     """
-    Миддлвэа для логгирования запросов
-    :param request:
-    :param call_next:
+    Создание приложения. Схема базы здесь не создается и не проверяется - это делает команда bootstrap.py,
+    поэтому запуск воркера не обращается к базе
     :return:
     """
-    # генерируем идентификатор запроса
-    request_id = uuid.uuid4().hex
-    # фиксируем время начала выполнения
-    start_time = time()
-    # пишем в логи информацию о начале обработки
-    logger.info(
-        f'Начато выполнение запроса {request_id} по адресу {request.url.path}. Метод запроса - {request.method}'
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.mount('/app/media', StaticFiles(directory='media'), name='media')
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=['X-Request-ID'],
     )
-    # выполнеяем запрос
-    response = await call_next(request)
-    # высчитываем время выполения
-    process_time = time() - start_time
-    # пишем в логи информацию о результате обработки
-    logger.info(
-        f'Запрос {request_id} выполнен за {process_time}. Код ответа - {response.status_code}'
-    )
-    return response
+    app.add_middleware(MetricsMiddleware)
+    # добавлена последней - внешняя, поэтому учитывает время всех остальных миддлвэа
+    app.add_middleware(RequestLoggingMiddleware)
+    for name in ROUTERS:
+        app.include_router(import_module(f'routers.{name}').router)
+    return app
+
+
+_app: FastAPI | None = None
+
+
+def __getattr__(name: str):
+    # main:app создается при первом обращении, импорт main для скриптов и инструментов остается легким
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-app.include_router(tags.router)
-app.include_router(rooms.router)
-app.include_router(categories.router)
-app.include_router(auth.router)
-app.include_router(clients.router)
-app.include_router(workers.router)
-app.include_router(groups.router)
-app.include_router(permissions.router)
-app.include_router(sales.router)
-app.include_router(photos.router)
 
 if __name__ == "__main__":
-    uvicorn.run('main:app', host='0.0.0.0', reload=True)
+    uvicorn.run('main:create_app', factory=True, host='0.0.0.0', reload=True)
@@ -0,0 +1,345 @@
+"""
+Метрики запросов в формате Prometheus: количество запросов и гистограммы времени ответа по шаблону маршрута,
+методу и коду ответа, запросы в обработке, загрузка пула потоков для синхронных обработчиков
+и счетчики кэша пользователей. Метрики собираются в памяти воркера без блокировок (их меняет только цикл событий),
+периодически записываются снимком в файл воркера в METRICS_DIR, а /metrics складывает снимки всех живых воркеров.
+Счетчики завершившихся воркеров переносятся в общий файл RETIRED_FILE, чтобы суммы не уменьшались при перезапуске
+воркера (Prometheus принял бы это за сброс счетчика).
+Квантили (p50/p95/p99) считаются по гистограмме на стороне Prometheus: histogram_quantile(0.95, ...)
+"""
+import fcntl
+import logging
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from time import perf_counter, sleep
+import anyio.to_thread
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import app_settings
+from users_cache import users_cache
+
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = tuple(sorted(app_settings.METRICS_BUCKETS))
+# метка для запросов, не попавших ни в один маршрут, чтобы произвольные адреса не раздували число рядов
+UNMATCHED_ROUTE = '<unmatched>'
+# счетчики завершившихся воркеров (не .json, чтобы не считаться снимком живого воркера)
+RETIRED_FILE = 'retired.metrics'
+# счетчики кэша пользователей, которые переносятся из снимков завершившихся воркеров
+USERS_CACHE_COUNTERS = ('hits', 'misses', 'invalidations')
+
+
+class WorkerMetrics:
+    """
+    Метрики текущего процесса
+    """
+    def __init__(self):
+        self.pid = os.getpid()
+        # (маршрут, метод, код) -> [количество, сумма времени, количество по интервалам гистограммы...]
+        self.requests: dict[tuple[str, str, int], list] = {}
+        self.in_flight = 0
+        self.saturated = 0
+        self.limiter = None
+        self._flusher: threading.Thread | None = None
+
+    def observe(self, route: str, method: str, status: int, duration: float):
+        series = self.requests.get((route, method, status))
+        if series is None:
+            series = self.requests[(route, method, status)] = [0, 0.0] + [0] * (len(BUCKETS) + 1)
+        series[0] += 1
+        series[1] += duration
+        series[2 + bisect_left(BUCKETS, duration)] += 1
+
+    def threadpool(self) -> tuple[int, int]:
+        """
+        Занятые потоки и размер пула потоков anyio (в нем выполняются синхронные обработчики)
+        :return:
+        """
+        if self.limiter is None:
+            return 0, 0
+        return self.limiter.borrowed_tokens, int(self.limiter.total_tokens)
+
+    def snapshot(self) -> dict:
+        busy, size = self.threadpool()
+        return {
+            'requests': [[*key, *series] for key, series in list(self.requests.items())],
+            'in_flight': self.in_flight,
+            'threadpool_busy': busy,
+            'threadpool_size': size,
+            'saturated': self.saturated,
+            'users_cache': users_cache.stats(),
+        }
+
+    def flush(self):
+        """
+        Запись снимка метрик в файл воркера (через временный файл, чтобы читатели не видели запись наполовину)
+        :return:
+        """
+        os.makedirs(app_settings.METRICS_DIR, exist_ok=True)
+        _write(os.path.join(app_settings.METRICS_DIR, f'{self.pid}.json'), self.snapshot())
+
+    def _flush_forever(self):
+        while True:
+            try:
+                self.flush()
+            except OSError as err:
+                logger.warning(f'Не удалось записать метрики. {str(err)}')
+            sleep(app_settings.METRICS_FLUSH_INTERVAL)
+
+    def start(self):
+        """
+        Запуск фоновой записи снимков. Вызывается из цикла событий при первом запросе воркера
+        :return:
+        """
+        self.limiter = anyio.to_thread.current_default_thread_limiter()
+        self._flusher = threading.Thread(target=self._flush_forever, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+
+_metrics: WorkerMetrics | None = None
+
+
+def worker_metrics() -> WorkerMetrics:
+    """
+    Метрики текущего процесса. После fork воркер получает новые, а не копию метрик родителя
+    :return:
+    """
+    global _metrics
+    if _metrics is None or _metrics.pid != os.getpid():
+        _metrics = WorkerMetrics()
+        _metrics.start()
+    return _metrics
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Шаблон маршрута (/categories/{category_id}), по которому роутер направил запрос
+    :param scope:
+    :return:
+    """
+    endpoint = scope.get('endpoint')
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    router = scope['app'].router
+    templates = getattr(router, 'metrics_templates', None)
+    if templates is None:
+        # при совпадении обработчиков у нескольких маршрутов роутер выбирает первый, берем его шаблон
+        templates = {}
+        for route in router.routes:
+            templates.setdefault(getattr(route, 'endpoint', getattr(route, 'app', None)), route.path)
+        router.metrics_templates = templates
+    return templates.get(endpoint, UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """
+    ASGI миддлвэа учета запросов
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        metrics = worker_metrics()
+        busy, size = metrics.threadpool()
+        if size and busy >= size:
+            metrics.saturated += 1
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        metrics.in_flight += 1
+        start_time = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            metrics.observe(route_template(scope), scope['method'], status_code, perf_counter() - start_time)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _write(path: str, data: dict):
+    # flush вызывают и фоновый поток, и /metrics, поэтому у каждой записи свой временный файл
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'{os.getpid()}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(orjson.dumps(data))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _read(path: str) -> dict | None:
+    try:
+        with open(path, 'rb') as file:
+            return orjson.loads(file.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+
+
+def empty_retired() -> dict:
+    return {
+        'buckets': list(BUCKETS),
+        'requests': [],
+        'in_flight': 0,
+        'threadpool_busy': 0,
+        'threadpool_size': 0,
+        'saturated': 0,
+        'users_cache': {**{key: 0 for key in USERS_CACHE_COUNTERS}, 'size': 0},
+        'retired': True,
+    }
+
+
+def merge_requests(total: dict[tuple, list], rows: list[list]):
+    """
+    Сложение рядов запросов снимка с накопленными
+    :param total: (маршрут, метод, код) -> ряд
+    :param rows: ряды снимка [маршрут, метод, код, количество, сумма времени, интервалы...]
+    :return:
+    """
+    for route, method, status, *series in rows:
+        current = total.setdefault((route, method, status), [0] * len(series))
+        for i, value in enumerate(series):
+            current[i] += value
+
+
+def retire(retired: dict, snapshot: dict):
+    """
+    Перенос счетчиков завершившегося воркера в общие счетчики (показатели текущего состояния не переносятся)
+    :param retired: общие счетчики завершившихся воркеров
+    :param snapshot: последний снимок завершившегося воркера
+    :return:
+    """
+    requests = {tuple(row[:3]): row[3:] for row in retired['requests']}
+    merge_requests(requests, snapshot['requests'])
+    retired['requests'] = [[*key, *series] for key, series in requests.items()]
+    retired['saturated'] += snapshot['saturated']
+    for key in USERS_CACHE_COUNTERS:
+        retired['users_cache'][key] += snapshot['users_cache'][key]
+
+
+def collect() -> list[dict]:
+    """
+    Снимки метрик всех живых воркеров и общие счетчики завершившихся (последним элементом, с ключом retired).
+    Снимки завершившихся воркеров переносятся в общие счетчики и удаляются. Сбор выполняется под файловой
+    блокировкой, чтобы параллельный сбор в другом воркере не перенес снимок дважды и не вернул его одновременно
+    и как снимок живого воркера, и в общих счетчиках
+    :return:
+    """
+    metrics = worker_metrics()
+    metrics.flush()
+    snapshots = []
+    retired_path = os.path.join(app_settings.METRICS_DIR, RETIRED_FILE)
+    with open(os.path.join(app_settings.METRICS_DIR, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        retired = _read(retired_path)
+        if retired is None or retired.get('buckets') != list(BUCKETS):
+            # при смене границ гистограммы прежние счетчики несовместимы с новыми снимками
+            retired = empty_retired()
+        for name in os.listdir(app_settings.METRICS_DIR):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(app_settings.METRICS_DIR, name)
+            snapshot = _read(path)
+            if _pid_alive(int(name[:-len('.json')])):
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+                continue
+            if snapshot is not None:
+                retire(retired, snapshot)
+                # общие счетчики сохраняем до удаления снимка, чтобы при сбое его счетчики не пропали
+                _write(retired_path, retired)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    snapshots.append(retired)
+    return snapshots
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render(snapshots: list[dict]) -> str:
+    """
+    Сложение снимков воркеров и вывод в текстовом формате Prometheus
+    :param snapshots:
+    :return:
+    """
+    requests = {}
+    for snapshot in snapshots:
+        merge_requests(requests, snapshot['requests'])
+
+    lines = [
+        '# HELP hotel_http_requests_total Количество обработанных запросов',
+        '# TYPE hotel_http_requests_total counter',
+    ]
+    for (route, method, status), series in sorted(requests.items()):
+        lines.append(f'hotel_http_requests_total{_labels(route=route, method=method, status=status)} {series[0]}')
+
+    lines += [
+        '# HELP hotel_http_request_duration_seconds Время обработки запроса',
+        '# TYPE hotel_http_request_duration_seconds histogram',
+    ]
+    for (route, method, status), series in sorted(requests.items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, '+Inf'), series[2:]):
+            cumulative += count
+            labels = _labels(route=route, method=method, status=status, le=bound)
+            lines.append(f'hotel_http_request_duration_seconds_bucket{labels} {cumulative}')
+        labels = _labels(route=route, method=method, status=status)
+        lines.append(f'hotel_http_request_duration_seconds_sum{labels} {series[1]}')
+        lines.append(f'hotel_http_request_duration_seconds_count{labels} {series[0]}')
+
+    gauges = (
+        ('hotel_http_requests_in_flight', 'gauge', 'Запросы в обработке', 'in_flight'),
+        ('hotel_threadpool_busy_threads', 'gauge', 'Занятые потоки пула синхронных обработчиков', 'threadpool_busy'),
+        ('hotel_threadpool_max_threads', 'gauge', 'Размер пула потоков синхронных обработчиков', 'threadpool_size'),
+        ('hotel_threadpool_saturated_total', 'counter', 'Запросы, начатые при полностью занятом пуле потоков',
+         'saturated'),
+    )
+    for name, kind, description, key in gauges:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        lines.append(f'{name} {sum(snapshot[key] for snapshot in snapshots)}')
+    # кэш пользователей: попадания показывают, сколько обращений к базе он убрал
+    users_cache_metrics = (
+        ('hotel_users_cache_hits_total', 'counter', 'Пользователи, найденные в кэше', 'hits'),
+        ('hotel_users_cache_misses_total', 'counter', 'Пользователи, загруженные из базы', 'misses'),
+        ('hotel_users_cache_invalidations_total', 'counter', 'Записи, удаленные из кэша при изменениях',
+         'invalidations'),
+        ('hotel_users_cache_size', 'gauge', 'Записи в кэше пользователей', 'size'),
+    )
+    for name, kind, description, key in users_cache_metrics:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        lines.append(f'{name} {sum(snapshot["users_cache"][key] for snapshot in snapshots)}')
+    lines += [
+        '# HELP hotel_workers Воркеры, приславшие метрики',
+        '# TYPE hotel_workers gauge',
+        f'hotel_workers {sum(1 for snapshot in snapshots if not snapshot.get("retired"))}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,98 @@
+import logging
+import uuid
+from contextvars import ContextVar
+from time import perf_counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from database import engine, async_engine
+from sql_stats import RequestQueries, request_queries_var
+
+
+logger = logging.getLogger('requests_logger')
+
+# идентификатор текущего запроса, доступен в любом коде, выполняемом в рамках запроса
+request_id_var: ContextVar[str | None] = ContextVar('request_id', default=None)
+
+REQUEST_ID_HEADER = b'x-request-id'
+SERVER_TIMING_HEADER = b'server-timing'
+
+
+def get_request_id() -> str | None:
+    """
+    Идентификатор обрабатываемого запроса (None вне запроса)
+    :return:
+    """
+    return request_id_var.get()
+
+
+class RequestLoggingMiddleware:
+    """
+    ASGI миддлвэа для логгирования запросов. В отличие от @app.middleware('http') не оборачивает запрос
+    в отдельную задачу и поток, поэтому не мешает потоковым ответам и фоновым задачам.
+    Замеряет время до первого байта ответа и общее время до отправки ответа целиком
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        # генерируем идентификатор запроса и делаем его доступным всему коду запроса
+        request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        # счетчики запросов к базе, которые выполнит этот запрос
+        queries = RequestQueries(request_id, scope)
+        queries_token = request_queries_var.set(queries)
+        # фиксируем время начала выполнения по монотонным часам
+        start_time = perf_counter()
+        status_code = 500
+        first_byte_time = None
+        response_time = None
+        # пишем в логи информацию о начале обработки
+        logger.info(
+            'Начато выполнение запроса %s по адресу %s. Метод запроса - %s',
+            request_id, scope['path'], scope['method'], extra={'request_id': request_id},
+        )
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, first_byte_time, response_time
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                first_byte_time = perf_counter() - start_time
+                message['headers'] = [
+                    *message.get('headers', ()),
+                    (REQUEST_ID_HEADER, request_id.encode()),
+                    # запросы к базе, выполненные до начала ответа, и время до начала ответа
+                    (SERVER_TIMING_HEADER, f'{queries.server_timing()}, app;dur={first_byte_time * 1000:.3f}'.encode()),
+                ]
+            elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                response_time = perf_counter() - start_time
+            await send(message)
+
+        try:
+            # выполнеяем запрос
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # время до отправки ответа, без фоновых задач, которые выполняются после нее
+            process_time = response_time if response_time is not None else perf_counter() - start_time
+            # пишем в логи информацию о результате обработки и загрузке пулов соединений
+            logger.info(
+                'Запрос %s выполнен за %.6f (первый байт через %s). Код ответа - %s. '
+                'Запросов к базе - %s за %.6f. Занято соединений - %s (sync), %s (async)',
+                request_id, process_time, '-' if first_byte_time is None else f'{first_byte_time:.6f}', status_code,
+                queries.count, queries.duration,
+                engine.pool.checkedout(), async_engine.sync_engine.pool.checkedout(),
+                extra={
+                    'request_id': request_id,
+                    'path': scope['path'],
+                    'method': scope['method'],
+                    'status_code': status_code,
+                    'duration': process_time,
+                    'ttfb': first_byte_time,
+                    'db_queries': queries.count,
+                    'db_time': queries.duration,
+                },
+            )
+            request_queries_var.reset(queries_token)
+            request_id_var.reset(token)
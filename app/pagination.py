@@ -0,0 +1,74 @@
+from typing import Iterator, AsyncIterator, Sequence
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from hotel_business_module.models.base import Base
+from config import app_settings
+from serializers import Serializer, dumps
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def _page_query(query: Select, list_params: dict) -> Select:
+    return query.limit(list_params['limit']).offset(list_params['offset'])
+
+
+def get_page(query: Select, list_params: dict, db: Session) -> Sequence[Base]:
+    """
+    Получение одной страницы списка
+    :param query: запрос списка (с сортировкой)
+    :param list_params: параметры из list_params_dependency
+    :param db: сессия sqlalchemy
+    :return:
+    """
+    return db.scalars(_page_query(query, list_params)).all()
+
+
+async def aget_page(query: Select, list_params: dict, db: AsyncSession) -> Sequence[Base]:
+    """
+    Получение одной страницы списка через асинхронную сессию
+    :param query: запрос списка (с сортировкой)
+    :param list_params: параметры из list_params_dependency
+    :param db: асинхронная сессия sqlalchemy
+    :return:
+    """
+    return (await db.scalars(_page_query(query, list_params))).all()
+
+
+def _serialize_batch(items: Sequence[Base], serializer: Serializer) -> bytes:
+    return b''.join(dumps(item) + b'\n' for item in serializer.to_list(items))
+
+
+def stream_ndjson(query: Select, serializer: Serializer, db: Session) -> StreamingResponse:
+    """
+    Потоковая выдача списка в формате NDJSON. Строки читаются серверным курсором пачками,
+    поэтому потребление памяти не зависит от размера таблицы
+    :param query: запрос списка (с сортировкой)
+    :param serializer: сериализатор строк
+    :param db: сессия sqlalchemy (закрывается зависимостью после отправки ответа)
+    :return:
+    """
+    def generate() -> Iterator[bytes]:
+        result = db.scalars(query.execution_options(yield_per=app_settings.STREAM_BATCH_SIZE))
+        for batch in result.partitions():
+            yield _serialize_batch(batch, serializer)
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def astream_ndjson(query: Select, serializer: Serializer, db: AsyncSession) -> StreamingResponse:
+    """
+    Потоковая выдача списка в формате NDJSON через асинхронную сессию
+    :param query: запрос списка (с сортировкой)
+    :param serializer: сериализатор строк
+    :param db: асинхронная сессия sqlalchemy (закрывается зависимостью после отправки ответа)
+    :return:
+    """
+    async def generate() -> AsyncIterator[bytes]:
+        result = await db.stream_scalars(query.execution_options(yield_per=app_settings.STREAM_BATCH_SIZE))
+        async for batch in result.partitions():
+            yield _serialize_batch(batch, serializer)
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from typing import Iterator
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """
+    Счетчик SQL запросов, выполненных через движок
+    """
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(db_engine: Engine) -> Iterator[QueryCounter]:
+    """
+    Подсчет SQL запросов внутри блока
+    :param db_engine: синхронный движок (для асинхронного - async_engine.sync_engine)
+    :return: счетчик запросов
+    """
+    counter = QueryCounter()
+    event.listen(db_engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(db_engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def assert_num_queries(db_engine: Engine, expected: int) -> Iterator[QueryCounter]:
+    """
+    Проверка количества SQL запросов внутри блока (например, вызова эндпоинта через TestClient),
+    чтобы ловить появление N+1 запросов
+    :param db_engine: синхронный движок (для асинхронного - async_engine.sync_engine)
+    :param expected: ожидаемое количество запросов
+    :return: счетчик запросов
+    """
+    with count_queries(db_engine) as counter:
+        yield counter
+    if counter.count != expected:
+        executed = '\n'.join(counter.statements)
+        raise AssertionError(f'Ожидалось {expected} SQL запросов, выполнено {counter.count}:\n{executed}')
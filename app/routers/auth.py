@@ -9,14 +9,14 @@ from hotel_business_module.models.tokens import TokenType
 from hotel_business_module.models.users import Client as DbClient
 from hotel_business_module.settings import settings
 from tasks import send_email_to_user
+from auth_tokens import generate_auth_tokens, refresh_auth_tokens
+from users_cache import users_cache
 from schemas.jwt_tokens import JWTToken
 from schemas.users import UserLogin, UserSingUp, User
 from schemas.permissions import Permission
 import logging
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
@@ -46,7 +46,7 @@ def login(
         logger.warning(f'Ошибка при аутентификации пользователя {user.email[0:4]}***')
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(err))
 
-    access_token, refresh_token = UsersGateway.generate_auth_tokens(user.id)
+    access_token, refresh_token = generate_auth_tokens(user.id, db)
     return JWTToken(access_token=access_token, refresh_token=refresh_token)
 
 
@@ -65,7 +65,7 @@ def refresh_user_token(
     """
     try:
         logger.info('Попытка обновления токена доступа')
-        access_token, refresh_token = UsersGateway.refresh_auth_tokens(token, db)
+        access_token, refresh_token = refresh_auth_tokens(token, db)
     except ValueError as err:
         logger.warning('Ошибка обновления токена доступа')
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(err))
@@ -128,6 +128,7 @@ def reset_password(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Ошибка подтврждения. Проверьте ссылку')
 
     UsersGateway.confirm_reset(token=reset_token, password=password, db=db)
+    users_cache.invalidate(reset_token.user_id)
     response = jsonable_encoder({'msg': 'Пароль успешно изменен'})
     return JSONResponse(content=response)
 
@@ -190,6 +191,7 @@ def confirm_sign_up(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Ошибка подтврждения. Проверьте ссылку')
 
     UsersGateway.confirm_account(token=sing_up_token, db=db)
+    users_cache.invalidate(sing_up_token.user_id)
     response = jsonable_encoder({'msg': 'Регистрация завершена'})
     return JSONResponse(content=response)
 
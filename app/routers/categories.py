@@ -1,27 +1,34 @@
-from fastapi import APIRouter, Depends, UploadFile, HTTPException, status, Body
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-from pydantic import parse_obj_as
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, UploadFile, HTTPException, status, Body, Query
 from typing import Annotated
-from schemas.categories import Category, CategoryCreateForm, CategoryUpdateForm
-from schemas.tags import Tag
-from schemas.sales import Sale
-from schemas.rooms import Room
-from schemas.photos import Photo
-from dependencies import get_db, PermissionsDependency
+from schemas.categories import Category, CategoryPrice, CategoryCreateForm, CategoryUpdateForm, category_serializer
+from schemas.tags import Tag, tag_serializer
+from schemas.sales import Sale, sale_serializer
+from schemas.rooms import Room, room_serializer
+from schemas.photos import Photo, photo_serializer
+from schemas.category_details import CategoryFull, CategoryFacets
+from serializers import FastJSONResponse, dumps
+from dependencies import get_db, get_async_db, PermissionsDependency, catalog_etag, catalog_dated_etag
+from catalog.version import catalog_cache_headers
+from catalog.events import catalog_changed
+from catalog.similarity import similarity_index
+from catalog.snapshot import catalog_snapshot
+from catalog.prices import price_calendar
+from catalog.search import search_index
+from catalog.facets import category_facets
+from config import app_settings
 from hotel_business_module.gateways.categories_gateway import CategoriesGateway
-from hotel_business_module.gateways.tags_gateway import TagsGateway
-from hotel_business_module.gateways.sales_gateway import SalesGateway
 from hotel_business_module.models.categories import Category as DbCategory
 from hotel_business_module.models.sales import Sale as DbSale
 from hotel_business_module.models.tags import Tag as DbTag
+from async_gateways import AsyncCategoriesGateway, AsyncTagsGateway, AsyncSalesGateway
+from loader_options import CATEGORY_TAGS, CATEGORY_SALES, CATEGORY_PHOTOS, CATEGORY_ROOMS, CATEGORY_INCLUDES
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils import raise_not_fount, update_model_fields
 import logging
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -31,6 +38,10 @@ router = APIRouter(
 )
 
 db_depends = Annotated[Session, Depends(get_db)]
+async_db_depends = Annotated[AsyncSession, Depends(get_async_db)]
+etag_depends = Annotated[str, Depends(catalog_etag)]
+# ответы с фактическими ценами на сегодняшний день
+dated_etag_depends = Annotated[str, Depends(catalog_dated_etag)]
 
 
 def filter_params_dependency(
@@ -40,39 +51,184 @@ def filter_params_dependency(
         square_from: int | None = None, square_until: int | None = None,
         price_from: int | None = None, price_until: int | None = None,
         rooms_from: int | None = None, rooms_until: int | None = None,
+        effective_price_from: int | None = None, effective_price_until: int | None = None,
+        price_date: date | None = None, after: str | None = None,
 ):
     # получение параметров фильтрации для списка категорий
     return {field: val for field, val in locals().items() if val is not None}
 
 
 @router.get('/', response_model=list[Category])
-def get_categories(filter: Annotated[dict, Depends(filter_params_dependency)], db: db_depends):
+async def get_categories(
+        filter: Annotated[dict, Depends(filter_params_dependency)],
+        etag: dated_etag_depends,
+        db: async_db_depends,
+):
     logger.debug(f'поиск категорий с фильтром - {filter}')
-    items, pages_count = CategoriesGateway.filter(filter=filter, db=db)
+    try:
+        use_snapshot = (
+            app_settings.CATALOG_SNAPSHOT_ENABLED and 'after' not in filter
+            and filter.get('sort_by') not in catalog_snapshot.COLLATED_FIELDS
+        )
+        if use_snapshot:
+            # снимок каталога в памяти; курсорная пагинация и сортировка по названию (в порядке правил
+            # сортировки базы, чтобы курсор следующей страницы продолжал тот же порядок) - запросом к базе
+            await catalog_snapshot.ensure(db)
+            await price_calendar.ensure(db)
+            items, pages_count, next_cursor = catalog_snapshot.filter(filter)
+        else:
+            db_items, pages_count, next_cursor = await AsyncCategoriesGateway.filter(filter=filter, db=db)
+            items = category_serializer.to_list(db_items)
+    except ValueError as err:
+        logger.info(f'Ошибка поиска категорий. {str(err)}')
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
     pagination_info = {
         'pages_count': pages_count,
         'current_page': filter.get('page', 1),
+        # курсор для запроса следующей страницы через параметр after
+        'next_cursor': next_cursor,
     }
-    json_data = jsonable_encoder([pagination_info, *parse_obj_as(list[Category], items)])
-    return JSONResponse(content=json_data)
+    return FastJSONResponse(
+        dumps([pagination_info, *items]), headers=catalog_cache_headers(etag)
+    )
+
+
+@router.get('/facets', response_model=CategoryFacets)
+async def get_facets(
+        filter: Annotated[dict, Depends(filter_params_dependency)],
+        etag: dated_etag_depends,
+        db: async_db_depends,
+):
+    """
+    Количество категорий, подходящих под фильтр, по значениям каждого фильтруемого поля
+    (кровати, этажи, комнаты) и по интервалам цены и площади - для панели фильтров
+    """
+    logger.debug(f'фасеты категорий с фильтром - {filter}')
+    try:
+        facets = await category_facets(filter, db)
+    except ValueError as err:
+        logger.info(f'Ошибка подсчета фасетов категорий. {str(err)}')
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    return FastJSONResponse(dumps(facets), headers=catalog_cache_headers(etag))
+
+
+@router.get('/search', response_model=list[Category])
+async def search_categories(
+        q: Annotated[str, Query(min_length=2)],
+        filter: Annotated[dict, Depends(filter_params_dependency)],
+        etag: dated_etag_depends,
+        db: async_db_depends,
+):
+    """
+    Поиск категорий по названию и описанию с учетом опечаток, по убыванию релевантности.
+    Совмещается с фильтрами списка категорий, параметры сортировки и курсор не используются
+    - **q**: поисковый запрос
+    """
+    logger.debug(f'полнотекстовый поиск категорий "{q}" с фильтром - {filter}')
+    try:
+        if db.bind.dialect.name == 'postgresql':
+            db_items, pages_count = await AsyncCategoriesGateway.search(q, filter, db)
+            items = category_serializer.to_list(db_items)
+        else:
+            # локальная замена базы без tsvector и pg_trgm - инвертированный индекс в памяти
+            await search_index.ensure(db)
+            await catalog_snapshot.ensure(db)
+            items, pages_count = catalog_snapshot.ranked(filter, search_index.search(q))
+    except ValueError as err:
+        logger.info(f'Ошибка поиска категорий. {str(err)}')
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    pagination_info = {'pages_count': pages_count, 'current_page': filter.get('page', 1)}
+    return FastJSONResponse(dumps([pagination_info, *items]), headers=catalog_cache_headers(etag))
 
 
 @router.get('/{category_id}', response_model=Category)
-def get_category(category_id: int, db: db_depends):
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+async def get_category(category_id: int, etag: etag_depends, db: async_db_depends):
+    db_category = await AsyncCategoriesGateway.get_by_id(category_id, db)
     if db_category is None:
         logger.warning(f'Категория с id {category_id} не найдена')
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    return db_category
+    return category_serializer.response(db_category, headers=catalog_cache_headers(etag))
 
 
-@router.get('/{category_id}/familiar', response_model=list[Category])
-def get_familiar(category_id: int, db: db_depends):
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+@router.get('/{category_id}/full', response_model=CategoryFull, response_model_exclude_none=True)
+async def get_category_full(
+        category_id: int,
+        etag: etag_depends,
+        db: async_db_depends,
+        include: str = 'tags,sales,photos,rooms,familiar',
+):
+    """
+    Категория вместе с подресурсами за один запрос
+    - **include**: список подресурсов через запятую (tags, sales, photos, rooms, familiar)
+    \f
+    :param category_id:
+    :param etag:
+    :param db:
+    :param include:
+    :return:
+    """
+    includes = {item.strip() for item in include.split(',') if item.strip()}
+    unknown = includes - CATEGORY_INCLUDES.keys() - {'familiar'}
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Неизвестные подресурсы: {", ".join(sorted(unknown))}'
+        )
+
+    # все запрошенные связи загружаются пакетными запросами в одной сессии
+    options = [option for item in includes & CATEGORY_INCLUDES.keys() for option in CATEGORY_INCLUDES[item]]
+    db_category = await AsyncCategoriesGateway.get_by_id(category_id, db, options=options)
     if db_category is None:
         logger.warning(f'Категория с id {category_id} не найдена')
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    return CategoriesGateway.get_familiar(db_category, db)
+
+    data = category_serializer.to_dict(db_category)
+    serializers = {
+        'tags': tag_serializer, 'sales': sale_serializer, 'photos': photo_serializer, 'rooms': room_serializer,
+    }
+    for item in includes & CATEGORY_INCLUDES.keys():
+        data[item] = serializers[item].to_list(getattr(db_category, item))
+    if 'familiar' in includes:
+        await similarity_index.ensure(db)
+        data['familiar'] = similarity_index.familiar(category_id) or []
+    return FastJSONResponse(dumps(data), headers=catalog_cache_headers(etag))
+
+
+@router.get('/{category_id}/prices', response_model=list[CategoryPrice])
+async def get_prices(
+        category_id: int,
+        db: async_db_depends,
+        date_from: date | None = Query(default=None, alias='from'),
+        date_to: date | None = Query(default=None, alias='to'),
+):
+    """
+    Фактические цены категории по дням с учетом действующих скидок
+    - **from**: первый день (по умолчанию сегодня)
+    - **to**: последний день включительно (по умолчанию через 30 дней после первого)
+    """
+    date_from = date_from or date.today()
+    date_to = date_to or date_from + timedelta(days=30)
+    await price_calendar.ensure(db)
+    try:
+        prices = price_calendar.calendar(category_id, date_from, date_to)
+    except ValueError as err:
+        logger.info(f'Ошибка получения цен категории {category_id}. {str(err)}')
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    if prices is None:
+        logger.warning(f'Категория с id {category_id} не найдена')
+        raise_not_fount(DbCategory.REPR_MODEL_NAME)
+    return FastJSONResponse(dumps(prices))
+
+
+@router.get('/{category_id}/familiar', response_model=list[Category])
+async def get_familiar(category_id: int, etag: etag_depends, db: async_db_depends):
+    # индекс обращается к базе, только если каталог изменился с момента его построения
+    await similarity_index.ensure(db)
+    familiar = similarity_index.familiar(category_id)
+    if familiar is None:
+        logger.warning(f'Категория с id {category_id} не найдена')
+        raise_not_fount(DbCategory.REPR_MODEL_NAME)
+    return FastJSONResponse(dumps(familiar), headers=catalog_cache_headers(etag))
 
 
 @router.post('/', response_model=Category, status_code=status.HTTP_201_CREATED)
@@ -94,6 +250,7 @@ async def create_category(
     except ValueError as err:
         logger.info(f'Ошибка создания категории. {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed(category=db_category)
     return db_category
 
 
@@ -121,117 +278,131 @@ async def edit_category(
     except ValueError as err:
         logger.info(f'Ошибка сохрарения категории. id - {category_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed(category=db_category)
     return db_category
 
 
 @router.delete('/{category_id}', status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(
+async def delete_category(
         category_id: int, 
-        db: db_depends, 
+        db: async_db_depends, 
         access: Annotated[None, Depends(PermissionsDependency(['delete_category']))],
 ):
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+    db_category = await AsyncCategoriesGateway.get_by_id(category_id, db)
     if db_category is not None:
-        CategoriesGateway.delete_category(db_category, db)
+        await AsyncCategoriesGateway.delete_category(db_category, db)
+        catalog_changed(removed_category_id=category_id)
 
 
 @router.get('/{category_id}/tags', response_model=list[Tag])
-def get_tags(category_id: int, db: db_depends):
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+async def get_tags(category_id: int, etag: etag_depends, db: async_db_depends):
+    db_category = await AsyncCategoriesGateway.get_by_id(
+        category_id, db, options=CATEGORY_TAGS
+    )
     if db_category is None:
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    return db_category.tags
+    return tag_serializer.list_response(db_category.tags, headers=catalog_cache_headers(etag))
 
 
 @router.put('/{category_id}/tags', response_model=Tag)
-def add_tag(
+async def add_tag(
         category_id: int,
         tag_id: Annotated[int, Body(embed=True)],
-        db: db_depends,
+        db: async_db_depends,
         access: Annotated[None, Depends(PermissionsDependency(['edit_category', 'edit_tag']))],
 ):
     logger.debug(f'попытка добавления тега {tag_id} к категории {category_id}')
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+    db_category = await AsyncCategoriesGateway.get_by_id(category_id, db)
     if db_category is None:
         logger.warning(f'Категория с id {category_id} не найдена')
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    db_tag = TagsGateway.get_by_id(tag_id, db)
+    db_tag = await AsyncTagsGateway.get_by_id(tag_id, db)
     if db_tag is None:
         logger.warning(f'Тег с id {tag_id} не найден')
         raise_not_fount(DbTag.REPR_MODEL_NAME)
 
-    CategoriesGateway.add_tag_to_category(db_category, db_tag, db)
+    await AsyncCategoriesGateway.add_tag_to_category(db_category, db_tag, db)
+    catalog_changed()
     return db_tag
 
 
 @router.delete('/{category_id}/tags', status_code=status.HTTP_204_NO_CONTENT)
-def remove_tag(
+async def remove_tag(
         category_id: int,
         tag_id: Annotated[int, Body(embed=True)],
-        db: db_depends,
+        db: async_db_depends,
         access: Annotated[None, Depends(PermissionsDependency(['edit_category', 'edit_tag']))],
 ):
     logger.debug(f'попытка удаления тега {tag_id} из категории {category_id}')
-    db_category = CategoriesGateway.get_by_id(category_id, db)
-    db_tag = TagsGateway.get_by_id(tag_id, db)
+    db_category = await AsyncCategoriesGateway.get_by_id(category_id, db)
+    db_tag = await AsyncTagsGateway.get_by_id(tag_id, db)
     if db_category is not None and db_tag is not None:
-        CategoriesGateway.remove_tag_from_category(db_category, db_tag, db)
+        await AsyncCategoriesGateway.remove_tag_from_category(db_category, db_tag, db)
+        catalog_changed()
 
 
 @router.get('/{category_id}/sales', response_model=list[Sale])
-def get_sales(category_id: int, db: db_depends):
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+async def get_sales(category_id: int, etag: etag_depends, db: async_db_depends):
+    db_category = await AsyncCategoriesGateway.get_by_id(
+        category_id, db, options=CATEGORY_SALES
+    )
     if db_category is None:
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    return db_category.sales
+    return sale_serializer.list_response(db_category.sales, headers=catalog_cache_headers(etag))
 
 
 @router.put('/{category_id}/sales', response_model=Sale)
-def add_sale(
+async def add_sale(
         category_id: int,
         sale_id: Annotated[int, Body(embed=True)],
-        db: db_depends,
+        db: async_db_depends,
         access: Annotated[None, Depends(PermissionsDependency(['edit_category', 'edit_sale']))],
 ):
     logger.debug(f'попытка добавления скидки {sale_id} к категории {category_id}')
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+    db_category = await AsyncCategoriesGateway.get_by_id(category_id, db)
     if db_category is None:
         logger.warning(f'Категория с id {category_id} не найдена')
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    db_sale = SalesGateway.get_by_id(sale_id, db)
+    db_sale = await AsyncSalesGateway.get_by_id(sale_id, db)
     if db_sale is None:
         logger.warning(f'Скидка с id {sale_id} не найден')
         raise_not_fount(DbSale.REPR_MODEL_NAME)
 
-    CategoriesGateway.add_sale_to_category(db_category, db_sale, db)
+    await AsyncCategoriesGateway.add_sale_to_category(db_category, db_sale, db)
+    catalog_changed(sale=db_sale, linked_sale=(category_id, sale_id))
     return db_sale
 
 
 @router.delete('/{category_id}/sales', status_code=status.HTTP_204_NO_CONTENT)
-def remove_tag(
+async def remove_tag(
         category_id: int,
         sale_id: Annotated[int, Body(embed=True)],
-        db: db_depends,
+        db: async_db_depends,
         access: Annotated[None, Depends(PermissionsDependency(['edit_category', 'edit_tag']))],
 ):
     logger.debug(f'попытка удаления скидки {sale_id} из категории {category_id}')
-    db_category = CategoriesGateway.get_by_id(category_id, db)
-    db_sale = SalesGateway.get_by_id(sale_id, db)
+    db_category = await AsyncCategoriesGateway.get_by_id(category_id, db)
+    db_sale = await AsyncSalesGateway.get_by_id(sale_id, db)
     if db_category is not None and db_sale is not None:
-        CategoriesGateway.remove_sale_to_category(db_category, db_sale, db)
+        await AsyncCategoriesGateway.remove_sale_to_category(db_category, db_sale, db)
+        catalog_changed(unlinked_sale=(category_id, sale_id))
 
 
 @router.get('/{category_id}/rooms', response_model=list[Room])
-def get_rooms(category_id: int, db: db_depends):
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+async def get_rooms(category_id: int, db: async_db_depends):
+    db_category = await AsyncCategoriesGateway.get_by_id(
+        category_id, db, options=CATEGORY_ROOMS
+    )
     if db_category is None:
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    return db_category.rooms
+    return room_serializer.list_response(db_category.rooms)
 
 
 @router.get('/{category_id}/photos', response_model=list[Photo])
-def get_photos(category_id: int, db: db_depends):
-    db_category = CategoriesGateway.get_by_id(category_id, db)
+async def get_photos(category_id: int, etag: etag_depends, db: async_db_depends):
+    db_category = await AsyncCategoriesGateway.get_by_id(
+        category_id, db, options=CATEGORY_PHOTOS
+    )
     if db_category is None:
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
-    return db_category.photos
+    return photo_serializer.list_response(db_category.photos, headers=catalog_cache_headers(etag))
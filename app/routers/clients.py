@@ -1,15 +1,17 @@
+from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
-from dependencies import get_db, PermissionsDependency
-from schemas.clients import Client, ClientCreate, ClientUpdate
+from dependencies import get_db, PermissionsDependency, list_params_dependency
+from pagination import get_page, stream_ndjson
+from sqlalchemy import select
+from schemas.clients import Client, ClientCreate, ClientUpdate, client_serializer
 from hotel_business_module.gateways.clients_gateway import ClientsGateway
 from hotel_business_module.models.users import Client as DbClient
 from sqlalchemy.orm import Session
 from utils import raise_not_fount, update_model_fields
+from users_cache import users_cache
 import logging
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -20,8 +22,14 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[Client], dependencies=[Depends(PermissionsDependency(['show_client']))],)
-def get_clients(db: Session = Depends(get_db)):
-    return ClientsGateway.get_all(db)
+def get_clients(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        db: Session = Depends(get_db),
+):
+    query = select(DbClient).order_by(DbClient.id)
+    if list_params['stream']:
+        return stream_ndjson(query, client_serializer, db)
+    return client_serializer.list_response(get_page(query, list_params, db))
 
 
 @router.get('/{client_id}', response_model=Client, dependencies=[Depends(PermissionsDependency(['show_client']))],)
@@ -65,6 +73,7 @@ def edit_client(
     try:
         update_model_fields(db_client, client.dict())
         ClientsGateway.save_client(db_client, db)
+        users_cache.invalidate(client_id)
     except ValueError as err:
         logger.info(f'Ошибка сохранения клиента {client_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
@@ -83,3 +92,4 @@ def delete_client(
     db_client = ClientsGateway.get_by_id(client_id, db)
     if db_client is not None:
         ClientsGateway.delete_client(db_client, db)
+        users_cache.invalidate(client_id)
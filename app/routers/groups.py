@@ -1,19 +1,21 @@
 from typing import Annotated
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from schemas.groups import Group, GroupCreate, GroupUpdate
+from schemas.groups import Group, GroupCreate, GroupUpdate, group_serializer
 from schemas.permissions import Permission
 from sqlalchemy.orm import Session
-from dependencies import get_db, PermissionsDependency
+from dependencies import get_db, PermissionsDependency, list_params_dependency
+from pagination import get_page, stream_ndjson
+from sqlalchemy import select
 from hotel_business_module.gateways.groups_gateway import GroupsGateway
 from hotel_business_module.gateways.permissions_gateway import PermissionsGateway
 from hotel_business_module.models.groups import Group as DbGroup
 from hotel_business_module.models.permissions import Permission as DbPermission
 from utils import update_model_fields, raise_not_fount
-from logger_conf import LOGGING as LOG_CONF
+from users_cache import users_cache
+from loader_options import GROUP_PERMISSIONS
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -24,8 +26,14 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[Group], dependencies=[Depends(PermissionsDependency(['show_group']))],)
-def get_groups(db: Session = Depends(get_db)):
-    return GroupsGateway.get_all(db)
+def get_groups(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        db: Session = Depends(get_db),
+):
+    query = select(DbGroup).order_by(DbGroup.id)
+    if list_params['stream']:
+        return stream_ndjson(query, group_serializer, db)
+    return group_serializer.list_response(get_page(query, list_params, db))
 
 
 @router.get('/{group_id}', response_model=Group, dependencies=[Depends(PermissionsDependency(['show_group']))],)
@@ -87,6 +95,8 @@ def delete_group(
     db_group = GroupsGateway.get_by_id(group_id, db)
     if db_group is not None:
         GroupsGateway.delete_group(db_group, db)
+        # права всех участников группы изменились
+        users_cache.clear()
 
 
 @router.get(
@@ -95,7 +105,7 @@ def delete_group(
     dependencies=[Depends(PermissionsDependency(['show_group', 'show_permissions']))]
 )
 def get_permissions(group_id: int, db: Session = Depends(get_db)):
-    db_group = GroupsGateway.get_by_id(group_id, db)
+    db_group = db.get(DbGroup, group_id, options=GROUP_PERMISSIONS)
     if db_group is None:
         logger.warning(f'Группа с id {group_id} не найдена')
         raise_not_fount(DbGroup.REPR_MODEL_NAME)
@@ -122,6 +132,8 @@ def add_permission(
         raise_not_fount(DbPermission.REPR_MODEL_NAME)
 
     GroupsGateway.add_permission_to_group(db_group, db_permission, db)
+    # права всех участников группы изменились
+    users_cache.clear()
     return db_permission
 
 
@@ -139,3 +151,5 @@ def remove_permission(
     db_permission = PermissionsGateway.get_by_id(permission_id, db)
     if db_group is not None and db_permission is not None:
         GroupsGateway.remove_permission_from_group(db_group, db_permission, db)
+        # права всех участников группы изменились
+        users_cache.clear()
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from database import pools_status
+from dependencies import monitoring_access
+
+
+router = APIRouter(
+    prefix='/health',
+    tags=['health', ],
+    dependencies=[Depends(monitoring_access)],
+)
+
+
+@router.get('/pool')
+async def get_pool_status():
+    """
+    Состояние пулов соединений с базой текущего воркера
+    \f
+    :return:
+    """
+    return pools_status()
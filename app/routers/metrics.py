@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from metrics import collect, render
+from dependencies import monitoring_access
+
+
+router = APIRouter(
+    tags=['metrics', ],
+    dependencies=[Depends(monitoring_access)],
+)
+
+
+@router.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """
+    Метрики запросов всех воркеров в текстовом формате Prometheus
+    \f
+    :return:
+    """
+    return PlainTextResponse(render(collect()), media_type='text/plain; version=0.0.4')
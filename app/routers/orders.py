@@ -0,0 +1,82 @@
+from typing import Annotated
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.bookings import Booking, BookingCreate, booking_serializer
+from dependencies import get_async_db, PermissionsDependency, list_params_dependency
+from pagination import aget_page, astream_ndjson
+from async_gateways import AsyncBookingsGateway, AsyncCategoriesGateway
+from bookings.events import bookings_changed
+from bookings.models import RoomBooking
+from hotel_business_module.models.categories import Category as DbCategory
+from utils import raise_not_fount
+
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter(
+    prefix='/orders',
+    tags=['orders', ],
+)
+
+
+@router.get('/', response_model=list[Booking], dependencies=[Depends(PermissionsDependency(['show_order']))])
+async def get_orders(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        db: AsyncSession = Depends(get_async_db),
+):
+    query = select(RoomBooking).order_by(RoomBooking.id)
+    if list_params['stream']:
+        return astream_ndjson(query, booking_serializer, db)
+    return booking_serializer.list_response(await aget_page(query, list_params, db))
+
+
+@router.get('/{order_id}', response_model=Booking, dependencies=[Depends(PermissionsDependency(['show_order']))])
+async def get_order(order_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_booking = await AsyncBookingsGateway.get_by_id(order_id, db)
+    if db_booking is None:
+        logger.warning(f'Бронь с id {order_id} не найдена')
+        raise_not_fount(RoomBooking.REPR_MODEL_NAME)
+    return booking_serializer.response(db_booking)
+
+
+@router.post('/', response_model=Booking, status_code=status.HTTP_201_CREATED)
+async def create_order(
+        order: BookingCreate,
+        access: Annotated[None, Depends(PermissionsDependency(['add_order']))],
+        db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Бронирование любой свободной комнаты категории на период проживания
+    - **category_id**: категория комнаты
+    - **date_start**: дата заезда
+    - **date_end**: дата выезда (в период не входит)
+    - **client_id**: клиент, на которого оформляется бронь
+    """
+    logger.debug(f'попытка бронирования в категории {order.category_id} c {order.date_start} по {order.date_end}')
+    if await AsyncCategoriesGateway.get_by_id(order.category_id, db) is None:
+        raise_not_fount(DbCategory.REPR_MODEL_NAME)
+
+    try:
+        db_booking = await AsyncBookingsGateway.book_room(
+            order.category_id, order.date_start, order.date_end, db, client_id=order.client_id,
+        )
+    except ValueError as err:
+        logger.info(f'Ошибка бронирования в категории {order.category_id}. {str(err)}')
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    bookings_changed(booking=db_booking)
+    return booking_serializer.response(db_booking, status_code=status.HTTP_201_CREATED)
+
+
+@router.delete('/{order_id}', status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_order(
+        order_id: int,
+        access: Annotated[None, Depends(PermissionsDependency(['cancel_order']))],
+        db: AsyncSession = Depends(get_async_db),
+):
+    db_booking = await AsyncBookingsGateway.get_by_id(order_id, db)
+    if db_booking is not None:
+        await AsyncBookingsGateway.cancel_booking(db_booking, db)
+        bookings_changed(cancelled_booking_id=order_id)
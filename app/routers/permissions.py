@@ -1,16 +1,16 @@
 from typing import Annotated
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from schemas.permissions import Permission
+from schemas.permissions import Permission, permission_serializer
 from sqlalchemy.orm import Session
-from dependencies import get_db, PermissionsDependency
+from dependencies import get_db, PermissionsDependency, list_params_dependency
+from pagination import get_page, stream_ndjson
+from sqlalchemy import select
 from hotel_business_module.gateways.permissions_gateway import PermissionsGateway
 from hotel_business_module.models.permissions import Permission as DbPermission
 from utils import update_model_fields, raise_not_fount
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -25,8 +25,14 @@ router = APIRouter(
     response_model=list[Permission],
     dependencies=[Depends(PermissionsDependency(['show_permission']))],
 )
-def get_permissions(db: Session = Depends(get_db)):
-    return PermissionsGateway.get_all(db)
+def get_permissions(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        db: Session = Depends(get_db),
+):
+    query = select(DbPermission).order_by(DbPermission.id)
+    if list_params['stream']:
+        return stream_ndjson(query, permission_serializer, db)
+    return permission_serializer.list_response(get_page(query, list_params, db))
 
 
 @router.get(
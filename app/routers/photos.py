@@ -1,16 +1,19 @@
 from fastapi import APIRouter, Depends, UploadFile, HTTPException, status
 from typing import Annotated
-from schemas.photos import Photo, PhotosCreateForm, PhotosUpdateForm
-from dependencies import get_db, PermissionsDependency
+from schemas.photos import Photo, PhotosCreateForm, PhotosUpdateForm, photo_serializer
+from dependencies import get_db, get_async_db, PermissionsDependency, list_params_dependency
+from pagination import aget_page, astream_ndjson
+from sqlalchemy import select
 from hotel_business_module.gateways.photos_gateway import PhotosGateway
 from hotel_business_module.models.photos import Photo as DbPhoto
+from async_gateways import AsyncPhotosGateway
+from catalog.events import catalog_changed
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils import raise_not_fount, update_model_fields
 import logging
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -21,17 +24,23 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[Photo])
-def get_photos(db: Session = Depends(get_db)):
-    return PhotosGateway.get_all(db)
+async def get_photos(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        db: AsyncSession = Depends(get_async_db),
+):
+    query = select(DbPhoto).order_by(DbPhoto.id)
+    if list_params['stream']:
+        return astream_ndjson(query, photo_serializer, db)
+    return photo_serializer.list_response(await aget_page(query, list_params, db))
 
 
 @router.get('/{photo_id}', response_model=Photo)
-def get_photo(photo_id: int, db: Session = Depends(get_db)):
-    db_photo = PhotosGateway.get_by_id(photo_id, db)
+async def get_photo(photo_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_photo = await AsyncPhotosGateway.get_by_id(photo_id, db)
     if db_photo is None:
         logger.warning(f'Фото с id {photo_id} не найдено')
         raise_not_fount(DbPhoto.REPR_MODEL_NAME)
-    return db_photo
+    return photo_serializer.response(db_photo)
 
 
 @router.post(
@@ -57,6 +66,7 @@ async def create_photo(
     except ValueError as err:
         logger.info(f'Ошибка создания фотографии. {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed()
     return db_photo
 
 
@@ -87,6 +97,7 @@ async def edit_photo(
     except ValueError as err:
         logger.info(f'Ошибка сохранения фото. id - {photo_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed()
     return db_photo
 
 
@@ -95,10 +106,11 @@ async def edit_photo(
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(PermissionsDependency(['delete_photo', 'edit_category']))],
 )
-def delete_photo(
+async def delete_photo(
         photo_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
-    db_photo = PhotosGateway.get_by_id(photo_id, db)
+    db_photo = await AsyncPhotosGateway.get_by_id(photo_id, db)
     if db_photo is not None:
-        PhotosGateway.delete_photo(db_photo, db)
+        await AsyncPhotosGateway.delete_photo(db_photo, db)
+        catalog_changed()
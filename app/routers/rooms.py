@@ -1,18 +1,22 @@
+from datetime import date
 from typing import Annotated
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from schemas.rooms import Room, RoomCreate, RoomUpdate
-from sqlalchemy.orm import Session
-from dependencies import get_db, PermissionsDependency
-from hotel_business_module.gateways.rooms_gateway import RoomsGateway
-from hotel_business_module.gateways.categories_gateway import CategoriesGateway
+from schemas.rooms import Room, RoomCreate, RoomUpdate, room_serializer
+from sqlalchemy.ext.asyncio import AsyncSession
+from dependencies import get_async_db, PermissionsDependency, list_params_dependency
+from pagination import aget_page, astream_ndjson
+from sqlalchemy import select
+from async_gateways import AsyncRoomsGateway, AsyncCategoriesGateway
+from loader_options import ROOMS_LIST, ROOM_DETAIL
+from bookings.availability import availability_index
+from catalog.events import catalog_changed
+from config import app_settings
 from hotel_business_module.models.rooms import Room as DbRoom
 from hotel_business_module.models.categories import Category as DbCategory
 from utils import raise_not_fount, update_model_fields
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -23,65 +27,104 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[Room])
-def get_rooms(db: Session = Depends(get_db)):
-    return RoomsGateway.get_all(db)
+async def get_rooms(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        db: AsyncSession = Depends(get_async_db),
+):
+    query = select(DbRoom).options(*ROOMS_LIST).order_by(DbRoom.id)
+    if list_params['stream']:
+        return astream_ndjson(query, room_serializer, db)
+    return room_serializer.list_response(await aget_page(query, list_params, db))
+
+
+@router.get('/available', response_model=list[Room])
+async def get_available_rooms(
+        date_start: date,
+        date_end: date,
+        category_id: int | None = None,
+        db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Комнаты, свободные на весь период проживания
+    - **date_start**: дата заезда
+    - **date_end**: дата выезда (в период не входит)
+    - **category_id**: искать только в этой категории
+    """
+    logger.debug(f'поиск свободных комнат c {date_start} по {date_end}, категория {category_id}')
+    if date_end <= date_start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Дата выезда должна быть позже даты заезда')
+    if date_start < date.today():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Дата заезда не может быть в прошлом')
+
+    busy_rooms = None
+    if app_settings.AVAILABILITY_INDEX_ENABLED:
+        await availability_index.ensure(db)
+        busy_rooms = availability_index.busy_rooms(date_start, date_end)
+    rooms = await AsyncRoomsGateway.get_available(
+        date_start, date_end, db, category_id=category_id, busy_rooms=busy_rooms,
+    )
+    return room_serializer.list_response(rooms)
 
 
 @router.get('/{room_id}', response_model=Room)
-def get_room(room_id: int, db: Session = Depends(get_db)):
-    db_room = RoomsGateway.get_by_id(room_id, db)
+async def get_room(room_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_room = await AsyncRoomsGateway.get_by_id(room_id, db, options=ROOM_DETAIL)
     if db_room is None:
         logger.warning(f'Комната с id {room_id} не найдена')
         raise_not_fount(DbRoom.REPR_MODEL_NAME)
-    return db_room
+    return room_serializer.response(db_room)
 
 
 @router.post('/', response_model=Room, status_code=status.HTTP_201_CREATED)
-def create_room(
+async def create_room(
         room: RoomCreate,
         access: Annotated[None, Depends(PermissionsDependency(['add_room']))],
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
-    db_category = CategoriesGateway.get_by_id(room.category_id, db)
+    db_category = await AsyncCategoriesGateway.get_by_id(room.category_id, db)
     logger.debug(f'попытка создание комнаты для категории {room.category_id}')
     if db_category is None:
         raise_not_fount(DbCategory.REPR_MODEL_NAME)
 
     try:
         db_room = DbRoom(**room.dict(), category=db_category)
-        RoomsGateway.save_room(db_room, db)
+        await AsyncRoomsGateway.save_room(db_room, db)
     except ValueError as err:
         logger.warning(f'Ошибка создания комнаты. номер - {room.room_number}, категория {room.category_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    # комнаты входят в полную карточку категории (/categories/{id}/full), которая кэшируется по версии каталога
+    catalog_changed()
     return db_room
 
 
 @router.put('/{room_id}', response_model=Room)
-def edit_room(
+async def edit_room(
         room_id: int,
         room: RoomUpdate,
         access: Annotated[None, Depends(PermissionsDependency(['edit_room']))],
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    db_room = RoomsGateway.get_by_id(room_id, db)
+    db_room = await AsyncRoomsGateway.get_by_id(room_id, db, options=ROOM_DETAIL)
     if db_room is None:
         raise_not_fount(DbRoom.REPR_MODEL_NAME)
 
     try:
         update_model_fields(db_room, room.dict())
-        RoomsGateway.save_room(db_room, db)
+        await AsyncRoomsGateway.save_room(db_room, db)
     except ValueError as err:
         logger.warning(f'Ошибка сохранения комнаты. id - {room_id}, категория {db_room.category_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed()
     return db_room
 
 
 @router.delete('/{room_id}', status_code=status.HTTP_204_NO_CONTENT)
-def delete_room(
+async def delete_room(
         room_id: int,
         access: Annotated[None, Depends(PermissionsDependency(['delete_room']))],
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
-    db_room = RoomsGateway.get_by_id(room_id, db)
+    db_room = await AsyncRoomsGateway.get_by_id(room_id, db, options=ROOM_DETAIL)
     if db_room is not None:
-        RoomsGateway.delete_room(db_room, db)
+        await AsyncRoomsGateway.delete_room(db_room, db)
+        catalog_changed()
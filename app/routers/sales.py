@@ -1,16 +1,25 @@
 from fastapi import APIRouter, Depends, UploadFile, HTTPException, status
+from datetime import datetime, timezone
 from typing import Annotated
-from schemas.sales import Sale, SaleCreateForm, SaleUpdateForm
-from dependencies import get_db, PermissionsDependency
+from schemas.sales import Sale, SaleCreateForm, SaleUpdateForm, sale_serializer
+from dependencies import get_db, get_async_db, PermissionsDependency, list_params_dependency, catalog_etag
+from dependencies import catalog_dated_etag
+from catalog.version import catalog_cache_headers
+from catalog.events import catalog_changed
+from catalog.sales import sales_index
+from serializers import FastJSONResponse, dumps
+from config import app_settings
+from pagination import aget_page, astream_ndjson
+from sqlalchemy import select
 from hotel_business_module.gateways.sales_gateway import SalesGateway
 from hotel_business_module.models.sales import Sale as DbSale
+from async_gateways import AsyncSalesGateway
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils import raise_not_fount, update_model_fields
 import logging
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -20,18 +29,87 @@ router = APIRouter(
 )
 
 
+def naive_utc(value: datetime) -> datetime:
+    """
+    Приведение момента времени к виду, в котором хранятся даты скидок (без часового пояса, UTC)
+    :param value:
+    :return:
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def sales_period(active_at: datetime | None, overlaps: str | None) -> tuple[datetime, datetime] | None:
+    """
+    Период поиска действующих скидок из параметров запроса
+    :param active_at: момент времени
+    :param overlaps: период "начало,конец"
+    :return: начало и конец периода или None, если поиск не по периоду
+    """
+    if active_at is not None and overlaps is not None:
+        raise ValueError('Параметры active_at и overlaps нельзя использовать вместе')
+    if active_at is not None:
+        active_at = naive_utc(active_at)
+        return active_at, active_at
+    if overlaps is not None:
+        try:
+            start, end = (naive_utc(datetime.fromisoformat(value.strip())) for value in overlaps.split(','))
+        except ValueError:
+            raise ValueError('Период overlaps должен быть задан как "начало,конец" в формате ISO')
+        if end < start:
+            raise ValueError('Конец периода должен быть не раньше его начала')
+        return start, end
+    return None
+
+
 @router.get('/', response_model=list[Sale])
-def get_sales(db: Session = Depends(get_db)):
-    return SalesGateway.get_all(db)
+async def get_sales(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        etag: Annotated[str, Depends(catalog_dated_etag)],
+        db: AsyncSession = Depends(get_async_db),
+        active_at: datetime | None = None,
+        overlaps: str | None = None,
+):
+    """
+    Список скидок
+    - **active_at**: только скидки, действующие в этот момент
+    - **overlaps**: только скидки, действующие хотя бы в один момент периода "начало,конец"
+    """
+    try:
+        period = sales_period(active_at, overlaps)
+    except ValueError as err:
+        logger.info(f'Ошибка поиска скидок. {str(err)}')
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    if period is not None and app_settings.SALES_INDEX_ENABLED and not list_params['stream']:
+        await sales_index.ensure(db)
+        sales = sales_index.overlapping(*period)
+        page = sales[list_params['offset']:list_params['offset'] + list_params['limit']]
+        return FastJSONResponse(dumps(page), headers=catalog_cache_headers(etag))
+
+    if period is None:
+        query = select(DbSale).order_by(DbSale.id)
+    else:
+        # поиск по индексу ix_sale_start_date_end_date
+        query = select(DbSale).where(DbSale.start_date <= period[1], DbSale.end_date >= period[0]).order_by(
+            DbSale.start_date, DbSale.end_date, DbSale.id
+        )
+    if list_params['stream']:
+        return astream_ndjson(query, sale_serializer, db)
+    return sale_serializer.list_response(await aget_page(query, list_params, db), headers=catalog_cache_headers(etag))
 
 
 @router.get('/{sale_id}', response_model=Sale)
-def get_sale(sale_id: int, db: Session = Depends(get_db)):
-    db_sale = SalesGateway.get_by_id(sale_id, db)
+async def get_sale(
+        sale_id: int,
+        etag: Annotated[str, Depends(catalog_etag)],
+        db: AsyncSession = Depends(get_async_db),
+):
+    db_sale = await AsyncSalesGateway.get_by_id(sale_id, db)
     if db_sale is None:
         logger.warning(f'Скидка с id {sale_id} не найдена')
         raise_not_fount(DbSale.REPR_MODEL_NAME)
-    return db_sale
+    return sale_serializer.response(db_sale, headers=catalog_cache_headers(etag))
 
 
 @router.post(
@@ -57,6 +135,7 @@ async def create_sale(
     except ValueError as err:
         logger.info(f'Ошибка создания скидки. {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed(sale=db_sale)
     return db_sale
 
 
@@ -87,6 +166,7 @@ async def edit_sale(
     except ValueError as err:
         logger.info(f'Ошибка сохранения скидки. id - {sale_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed(sale=db_sale)
     return db_sale
 
 
@@ -95,10 +175,11 @@ async def edit_sale(
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(PermissionsDependency(['delete_sale']))],
 )
-def delete_category(
+async def delete_category(
         sale_id: int,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
-    db_sale = SalesGateway.get_by_id(sale_id, db)
+    db_sale = await AsyncSalesGateway.get_by_id(sale_id, db)
     if db_sale is not None:
-        SalesGateway.delete_sale(db_sale, db)
+        await AsyncSalesGateway.delete_sale(db_sale, db)
+        catalog_changed(removed_sale_id=sale_id)
@@ -1,16 +1,18 @@
 from typing import Annotated
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from schemas.tags import Tag, TagCreate, TagUpdate
-from sqlalchemy.orm import Session
-from dependencies import get_db, PermissionsDependency
-from hotel_business_module.gateways.tags_gateway import TagsGateway
+from schemas.tags import Tag, TagCreate, TagUpdate, tag_serializer
+from sqlalchemy.ext.asyncio import AsyncSession
+from dependencies import get_async_db, PermissionsDependency, list_params_dependency, catalog_etag
+from catalog.version import catalog_cache_headers
+from catalog.events import catalog_changed
+from pagination import aget_page, astream_ndjson
+from sqlalchemy import select
+from async_gateways import AsyncTagsGateway
 from hotel_business_module.models.tags import Tag as DbTag
 from utils import update_model_fields, raise_not_fount
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -21,60 +23,74 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[Tag])
-def get_tags(db: Session = Depends(get_db)):
-    return TagsGateway.get_all(db)
+async def get_tags(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        etag: Annotated[str, Depends(catalog_etag)],
+        db: AsyncSession = Depends(get_async_db),
+):
+    query = select(DbTag).order_by(DbTag.id)
+    if list_params['stream']:
+        return astream_ndjson(query, tag_serializer, db)
+    return tag_serializer.list_response(await aget_page(query, list_params, db), headers=catalog_cache_headers(etag))
 
 
 @router.get('/{tag_id}', response_model=Tag)
-def get_tag(tag_id: int, db: Session = Depends(get_db)):
-    db_tag = TagsGateway.get_by_id(tag_id, db)
+async def get_tag(
+        tag_id: int,
+        etag: Annotated[str, Depends(catalog_etag)],
+        db: AsyncSession = Depends(get_async_db),
+):
+    db_tag = await AsyncTagsGateway.get_by_id(tag_id, db)
     if db_tag is None:
         logger.warning(f'Тег с id {tag_id} не найден')
         raise_not_fount(DbTag.REPR_MODEL_NAME)
-    return db_tag
+    return tag_serializer.response(db_tag, headers=catalog_cache_headers(etag))
 
 
 @router.post('/', response_model=Tag, status_code=status.HTTP_201_CREATED)
-def create_tag(
+async def create_tag(
         tag: TagCreate,
         #access: Annotated[None, Depends(PermissionsDependency(['add_tag']))],
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
     try:
         db_tag = DbTag(**tag.dict())
-        TagsGateway.save_tag(db_tag, db)
+        await AsyncTagsGateway.save_tag(db_tag, db)
     except ValueError as err:
         logger.warning(f'Ошибка создания тега {tag.name}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed()
     return db_tag
 
 
 @router.put('/{tag_id}', response_model=Tag)
-def edit_tag(
+async def edit_tag(
         tag_id: int,
         tag: TagUpdate,
         access: Annotated[None, Depends(PermissionsDependency(['edit_tag']))],
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
-    db_tag = TagsGateway.get_by_id(tag_id, db)
+    db_tag = await AsyncTagsGateway.get_by_id(tag_id, db)
     if db_tag is None:
         raise_not_fount(DbTag.REPR_MODEL_NAME)
 
     try:
         update_model_fields(db_tag, tag.dict())
-        TagsGateway.save_tag(db_tag, db)
+        await AsyncTagsGateway.save_tag(db_tag, db)
     except ValueError as err:
         logger.info(f'Ошибка сохранения тега {tag_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+    catalog_changed()
     return db_tag
 
 
 @router.delete('/{tag_id}', status_code=status.HTTP_204_NO_CONTENT)
-def delete_tag(
+async def delete_tag(
         tag_id: int,
         access: Annotated[None, Depends(PermissionsDependency(['delete_tag']))],
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_async_db),
 ):
-    db_tag = TagsGateway.get_by_id(tag_id, db)
+    db_tag = await AsyncTagsGateway.get_by_id(tag_id, db)
     if db_tag is not None:
-        TagsGateway.delete_tag(db_tag, db)
+        await AsyncTagsGateway.delete_tag(db_tag, db)
+        catalog_changed()
@@ -1,8 +1,10 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from dependencies import get_db, PermissionsDependency
-from schemas.workers import Worker, WorkerCreate, WorkerUpdate
+from dependencies import get_db, PermissionsDependency, list_params_dependency
+from pagination import get_page, stream_ndjson
+from sqlalchemy import select
+from schemas.workers import Worker, WorkerCreate, WorkerUpdate, worker_serializer
 from schemas.groups import Group
 from hotel_business_module.gateways.workers_gateway import WorkersGateway
 from hotel_business_module.gateways.groups_gateway import GroupsGateway
@@ -10,11 +12,11 @@ from hotel_business_module.models.users import Worker as DbWorker
 from hotel_business_module.models.groups import Group as DbGroup
 from sqlalchemy.orm import Session
 from utils import raise_not_fount, update_model_fields
+from users_cache import users_cache
+from loader_options import WORKER_GROUPS
 import logging
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 logger = logging.getLogger(__name__)
 
 
@@ -25,8 +27,14 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[Worker], dependencies=[Depends(PermissionsDependency(['show_worker']))],)
-def get_workers(db: Session = Depends(get_db)):
-    return WorkersGateway.get_all(db)
+def get_workers(
+        list_params: Annotated[dict, Depends(list_params_dependency)],
+        db: Session = Depends(get_db),
+):
+    query = select(DbWorker).order_by(DbWorker.id)
+    if list_params['stream']:
+        return stream_ndjson(query, worker_serializer, db)
+    return worker_serializer.list_response(get_page(query, list_params, db))
 
 
 @router.get('/{worker_id}', response_model=Worker, dependencies=[Depends(PermissionsDependency(['show_worker']))],)
@@ -70,6 +78,7 @@ def edit_worker(
     try:
         update_model_fields(db_worker, worker.dict())
         WorkersGateway.save_worker(db_worker, db)
+        users_cache.invalidate(worker_id)
     except ValueError as err:
         logger.info(f'Ошибка сохранения сотрудника {worker_id}, {str(err)}')
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
@@ -88,6 +97,7 @@ def delete_worker(
     db_worker = WorkersGateway.get_by_id(worker_id, db)
     if db_worker is not None:
         WorkersGateway.delete_worker(db_worker, db)
+        users_cache.invalidate(worker_id)
 
 
 @router.get(
@@ -96,7 +106,7 @@ def delete_worker(
     dependencies=[Depends(PermissionsDependency(['show_worker', 'show_group']))]
 )
 def get_groups(worker_id: int, db: Session = Depends(get_db)):
-    db_worker = WorkersGateway.get_by_id(worker_id, db)
+    db_worker = db.get(DbWorker, worker_id, options=WORKER_GROUPS)
     if db_worker is None:
         logger.warning(f'Сотрудник с id {worker_id} не найден')
         raise_not_fount(DbWorker.REPR_MODEL_NAME)
@@ -123,6 +133,7 @@ def add_group(
         raise_not_fount(DbGroup.REPR_MODEL_NAME)
 
     WorkersGateway.add_group_to_worker(db_worker, db_group, db)
+    users_cache.invalidate(worker_id)
     return db_group
 
 
@@ -140,3 +151,4 @@ def remove_group(
     db_group = GroupsGateway.get_by_id(group_id, db)
     if db_worker is not None and db_group is not None:
         WorkersGateway.remove_group_from_worker(db_worker, db_group, db)
+        users_cache.invalidate(worker_id)
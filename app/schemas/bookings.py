@@ -0,0 +1,35 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from serializers import Serializer
+
+
+class BookingCreate(BaseModel):
+    category_id: int
+    date_start: date
+    date_end: date
+    client_id: int | None = None
+
+
+class Booking(BaseModel):
+    id: int
+    room_id: int
+    client_id: int | None
+    date_start: date
+    date_end: date
+    date_created: datetime
+
+    class Config:
+        orm_mode = True
+        schema_extra = {
+            'example': {
+                'id': 12,
+                'room_id': 4,
+                'client_id': 7,
+                'date_start': '2023-06-01',
+                'date_end': '2023-06-05',
+                'date_created': '2023-05-12T10:21:08.350220',
+            },
+        }
+
+
+booking_serializer = Serializer(Booking)
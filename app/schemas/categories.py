@@ -1,11 +1,12 @@
 from pydantic import BaseModel, Field
 from fastapi.encoders import jsonable_encoder
 from typing import Annotated
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from fastapi import Form
 from dataclasses import dataclass
 from hotel_business_module.models.categories import Category as DbCategory
+from serializers import Serializer
 
 
 class CategoryBase(BaseModel):
@@ -55,6 +56,20 @@ class Category(CategoryBase):
         }
 
 
+category_serializer = Serializer(Category)
+
+
+class CategoryPrice(BaseModel):
+    date: date
+    price: float
+    discount: float
+
+    class Config:
+        schema_extra = {
+            'example': {'date': '2023-05-12', 'price': 2799.3, 'discount': 30},
+        }
+
+
 @dataclass
 class CategoryCreateForm:
     """
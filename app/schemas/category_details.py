@@ -0,0 +1,35 @@
+from pydantic import BaseModel, Field
+from .categories import Category
+from .photos import Photo
+from .rooms import Room
+from .sales import Sale
+from .tags import Tag
+
+
+class CategoryFull(Category):
+    tags: list[Tag] | None = None
+    sales: list[Sale] | None = None
+    photos: list[Photo] | None = None
+    rooms: list[Room] | None = None
+    familiar: list[Category] | None = None
+
+
+class FacetValue(BaseModel):
+    value: int
+    count: int
+
+
+class FacetRange(BaseModel):
+    # интервал [from, until)
+    from_: int = Field(alias='from')
+    until: int
+    count: int
+
+
+class CategoryFacets(BaseModel):
+    total: int
+    beds: list[FacetValue]
+    floors: list[FacetValue]
+    rooms: list[FacetValue]
+    price: list[FacetRange]
+    square: list[FacetRange]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import date, datetime
+from serializers import Serializer
 
 
 class ClientBase(BaseModel):
@@ -24,3 +25,6 @@ class Client(ClientBase):
 
     class Config:
         orm_mode = True
+
+
+client_serializer = Serializer(Client)
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from serializers import Serializer
 
 
 class GroupBase(BaseModel):
@@ -18,3 +19,6 @@ class Group(GroupBase):
 
     class Config:
         orm_mode = True
+
+
+group_serializer = Serializer(Group)
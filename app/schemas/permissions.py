@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from serializers import Serializer
 
 
 class Permission(BaseModel):
@@ -8,3 +9,6 @@ class Permission(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+permission_serializer = Serializer(Permission)
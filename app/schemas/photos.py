@@ -5,6 +5,7 @@ from fastapi import Form
 from .categories import Category
 from dataclasses import dataclass
 from hotel_business_module.models.photos import Photo as DbPhoto
+from serializers import Serializer
 
 
 class PhotoCreate(BaseModel):
@@ -25,6 +26,9 @@ class Photo(BaseModel):
         orm_mode = True
 
 
+photo_serializer = Serializer(Photo)
+
+
 @dataclass
 class PhotosCreateForm:
     """
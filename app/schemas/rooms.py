@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
 from .categories import Category
+from serializers import Serializer
 
 
 class RoomBase(BaseModel):
@@ -23,3 +24,6 @@ class Room(RoomBase):
 
     class Config:
         orm_mode = True
+
+
+room_serializer = Serializer(Room)
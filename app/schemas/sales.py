@@ -6,6 +6,7 @@ from decimal import Decimal
 from fastapi import Form
 from dataclasses import dataclass
 from hotel_business_module.models.categories import Category as DbCategory
+from serializers import Serializer
 
 
 class SaleBase(BaseModel):
@@ -45,6 +46,9 @@ class Sale(SaleBase):
         }
 
 
+sale_serializer = Serializer(Sale)
+
+
 @dataclass
 class SaleCreateForm:
     """
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from serializers import Serializer
 
 
 class TagBase(BaseModel):
@@ -18,3 +19,6 @@ class Tag(TagBase):
 
     class Config:
         orm_mode = True
+
+
+tag_serializer = Serializer(Tag)
@@ -1,6 +1,7 @@
 from decimal import Decimal
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
+from serializers import Serializer
 
 
 class WorkerBase(BaseModel):
@@ -25,3 +26,6 @@ class Worker(WorkerBase):
 
     class Config:
         orm_mode = True
+
+
+worker_serializer = Serializer(Worker)
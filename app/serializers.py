@@ -0,0 +1,96 @@
+from decimal import Decimal
+from typing import Any, Callable, Iterable
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+
+
+def _default(value: Any) -> Any:
+    # типы, которые orjson не сериализует сам
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Сериализация в json
+    :param data: данные
+    :return:
+    """
+    return orjson.dumps(data, default=_default)
+
+
+class FastJSONResponse(Response):
+    """
+    Ответ с уже сериализованным json (или данными, которые нужно сериализовать через orjson)
+    """
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class Serializer:
+    """
+    Предварительно скомпилированный сериализатор ORM объектов по схеме pydantic.
+    Поля схемы разбираются один раз, после чего объекты переводятся в словари без валидации
+    и сериализуются orjson за один проход
+    """
+    def __init__(self, schema: type[BaseModel]):
+        self.schema = schema
+        self._fields: list[tuple[str, Callable[[Any], Any] | None]] = []
+        for name, field in schema.__fields__.items():
+            converter = None
+            if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+                nested = Serializer(field.type_)
+                if field.shape == SHAPE_SINGLETON:
+                    converter = nested.to_dict
+                elif field.shape == SHAPE_LIST:
+                    converter = nested.to_list
+            self._fields.append((name, converter))
+
+    def to_dict(self, obj: Any) -> dict | None:
+        """
+        Перевод объекта в словарь
+        :param obj: ORM объект
+        :return:
+        """
+        if obj is None:
+            return None
+        data = {}
+        for name, converter in self._fields:
+            value = getattr(obj, name)
+            data[name] = converter(value) if converter is not None else value
+        return data
+
+    def to_list(self, items: Iterable[Any]) -> list[dict]:
+        """
+        Перевод списка объектов в список словарей
+        :param items: ORM объекты
+        :return:
+        """
+        to_dict = self.to_dict
+        return [to_dict(item) for item in items]
+
+    def response(self, obj: Any, status_code: int = 200, headers: dict | None = None) -> FastJSONResponse:
+        """
+        Ответ с одним объектом
+        :param obj: ORM объект
+        :param status_code: код ответа
+        :param headers: заголовки ответа
+        :return:
+        """
+        return FastJSONResponse(dumps(self.to_dict(obj)), status_code=status_code, headers=headers)
+
+    def list_response(self, items: Iterable[Any], headers: dict | None = None) -> FastJSONResponse:
+        """
+        Ответ со списком объектов
+        :param items: ORM объекты
+        :param headers: заголовки ответа
+        :return:
+        """
+        return FastJSONResponse(dumps(self.to_list(items)), headers=headers)
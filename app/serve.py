@@ -0,0 +1,158 @@
+"""
+Боевой запуск приложения: несколько воркеров uvicorn на общем сокете.
+Приложение создается один раз в родительском процессе до запуска воркеров, после чего куча сборщика мусора
+замораживается (gc.freeze), поэтому воркеры разделяют память родителя по copy-on-write и не копируют ее
+при сборке мусора. По SIGTERM/SIGINT воркеры перестают принимать соединения и дожидаются начатых запросов.
+Запуск из папки app: python serve.py (для разработки - python main.py с перезагрузкой)
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+import uvicorn
+from fastapi import FastAPI
+from config import app_settings
+from database import engine, async_engine
+from logger_conf import configure_logging, shutdown_logging
+from main import create_app
+
+
+logger = logging.getLogger(__name__)
+
+# воркер, проработавший меньше этого времени, считается упавшим при запуске
+STABLE_WORKER_SECONDS = 10
+
+
+def workers_count() -> int:
+    """
+    Количество воркеров: из настроек или по числу ядер, доступных процессу (с учетом ограничений контейнера)
+    :return:
+    """
+    if app_settings.SERVER_WORKERS > 0:
+        return app_settings.SERVER_WORKERS
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def bind_socket() -> socket.socket:
+    """
+    Общий для воркеров слушающий сокет
+    :return:
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((app_settings.SERVER_HOST, app_settings.SERVER_PORT))
+    sock.listen(app_settings.SERVER_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app: FastAPI, sock: socket.socket):
+    """
+    Работа воркера в дочернем процессе. Обработчики сигналов ставит uvicorn: по SIGTERM/SIGINT
+    он закрывает сокет и ждет завершения начатых запросов
+    :param app: приложение, созданное в родительском процессе
+    :param sock: слушающий сокет
+    :return:
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # пулы соединений не должны переходить из родителя: сбрасываем их, не закрывая чужие соединения
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    config = uvicorn.Config(
+        app,
+        loop='uvloop',
+        http='httptools',
+        lifespan='on',
+        backlog=app_settings.SERVER_BACKLOG,
+        timeout_keep_alive=app_settings.SERVER_KEEP_ALIVE,
+        # логирование уже настроено в родителе через logger_conf
+        log_config=None,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app: FastAPI, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock)
+        except BaseException:
+            logger.exception('Воркер завершился с ошибкой')
+            code = 1
+        finally:
+            shutdown_logging()
+            os._exit(code)
+    return pid
+
+
+def serve() -> int:
+    configure_logging()
+    sock = bind_socket()
+    # приложение и роутеры загружаются один раз, до форка
+    app = create_app()
+    # все объекты, созданные при загрузке, уводим из-под сборщика мусора, чтобы он не трогал их страницы в воркерах
+    gc.collect()
+    gc.freeze()
+
+    # pid воркера -> время его запуска
+    workers = {spawn(app, sock): time.monotonic() for _ in range(workers_count())}
+    logger.warning(
+        f'Запущено воркеров - {len(workers)}, адрес {app_settings.SERVER_HOST}:{app_settings.SERVER_PORT}'
+    )
+    # времена запланированных перезапусков и текущая пауза перед перезапуском
+    restarts: list[float] = []
+    restart_delay = 0.0
+    deadline = None
+
+    def stop(signum, frame):
+        nonlocal deadline
+        if deadline is None:
+            deadline = time.monotonic() + app_settings.SERVER_GRACEFUL_TIMEOUT
+            restarts.clear()
+            for pid in workers:
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers or restarts:
+        now = time.monotonic()
+        while restarts and restarts[0] <= now and deadline is None:
+            restarts.pop(0)
+            workers[spawn(app, sock)] = now
+        pid, status = os.waitpid(-1, os.WNOHANG) if workers else (0, 0)
+        if pid == 0:
+            if deadline is not None and now > deadline:
+                logger.warning('Воркеры не завершили запросы за отведенное время и будут остановлены')
+                for worker in workers:
+                    os.kill(worker, signal.SIGKILL)
+                deadline = float('inf')
+            time.sleep(0.1)
+            continue
+        started_at = workers.pop(pid)
+        # неожиданно завершившийся воркер заменяем новым, он также получает готовое приложение.
+        # Если воркеры падают сразу после запуска (например, при ошибке импорта), пауза перед перезапуском
+        # удваивается, чтобы не запускать процессы в бесконечном цикле
+        if deadline is None:
+            if now - started_at < STABLE_WORKER_SECONDS:
+                restart_delay = min(max(restart_delay * 2, 1), app_settings.SERVER_RESTART_MAX_DELAY)
+            else:
+                restart_delay = 0
+            logger.error(
+                f'Воркер {pid} завершился с кодом {os.waitstatus_to_exitcode(status)}, '
+                f'новый будет запущен через {restart_delay} с'
+            )
+            restarts.append(now + restart_delay)
+    sock.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(serve())
@@ -0,0 +1,92 @@
+"""
+Учет запросов к базе в рамках http запроса: количество, суммарное время и повторы одинаковых запросов.
+Счетчики текущего запроса хранятся в contextvar, который виден и в потоках синхронных обработчиков,
+и в greenlet асинхронных сессий sqlalchemy
+"""
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import app_settings
+
+
+logger = logging.getLogger(__name__)
+
+# список параметров в IN (...) сворачиваем, чтобы запросы с разным количеством значений считались одинаковыми
+PARAMETERS_LIST = re.compile(r'\(\s*(?:\$\d+|%\(\w+\)s|\?)(?:\s*,\s*(?:\$\d+|%\(\w+\)s|\?))+\s*\)')
+
+
+class RequestQueries:
+    """
+    Запросы к базе одного http запроса
+    """
+    __slots__ = ('request_id', 'scope', 'count', 'duration', 'shapes', 'reported')
+
+    def __init__(self, request_id: str, scope: dict):
+        self.request_id = request_id
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.reported = False
+
+    def server_timing(self) -> str:
+        """
+        Значение заголовка Server-Timing (время в миллисекундах)
+        :return:
+        """
+        return f'db;desc="{self.count} queries";dur={self.duration * 1000:.3f}'
+
+
+request_queries_var: ContextVar[RequestQueries | None] = ContextVar('request_queries', default=None)
+
+
+def statement_shape(statement: str) -> str:
+    return PARAMETERS_LIST.sub('(?)', statement)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_queries_var.get() is not None:
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = request_queries_var.get()
+    if queries is None or not conn.info.get('query_start'):
+        return
+    queries.count += 1
+    queries.duration += perf_counter() - conn.info['query_start'].pop()
+    shape = statement_shape(statement)
+    queries.shapes[shape] += 1
+    if queries.shapes[shape] > app_settings.SQL_REPEAT_THRESHOLD and not queries.reported:
+        # один раз на запрос, иначе предупреждение повторится на каждом следующем запросе к базе
+        queries.reported = True
+        # импорт здесь: метрики зависят от starlette, а модуль базы используется и вне приложения
+        from metrics import route_template
+        logger.warning(
+            'Запрос %s (%s %s) выполнил одинаковый запрос к базе больше %s раз, возможна проблема N+1: %s',
+            queries.request_id, queries.scope['method'], route_template(queries.scope),
+            app_settings.SQL_REPEAT_THRESHOLD, shape,
+            extra={'request_id': queries.request_id},
+        )
+
+
+def _handle_error(exception_context):
+    # при ошибке запроса after_cursor_execute не вызывается, убираем его время начала
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+
+def track_queries(db_engine: Engine):
+    """
+    Подключение учета запросов к движку
+    :param db_engine: синхронный движок (для асинхронного - async_engine.sync_engine)
+    :return:
+    """
+    event.listen(db_engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(db_engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(db_engine, 'handle_error', _handle_error)
@@ -2,10 +2,8 @@ from smtplib import SMTPException
 from email.errors import MessageError
 from hotel_business_module.utils.email_sender import send_email
 import logging
-from logger_conf import LOGGING as LOG_CONF
 
 
-logging.config.dictConfig(LOG_CONF)
 email_logger = logging.getLogger('email_logger')
 
 
@@ -0,0 +1,178 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from hotel_business_module.models.base import Base
+from catalog.version import CatalogVersion
+from config import app_settings
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    Запись кэша: отсоединенный от сессии пользователь и набор кодов его разрешений
+    """
+    user: Base
+    permissions: frozenset[str]
+    is_superuser: bool
+    expires_at: float
+    # общая версия пользователей и версия этого пользователя, с которыми запись была загружена из базы
+    version: str
+
+    def can_actions(self, codes: list[str]) -> bool:
+        """
+        Проверка наличия у пользователя всех переданных разрешений
+        :param codes: коды разрешений
+        :return:
+        """
+        return self.is_superuser or self.permissions.issuperset(codes)
+
+    @property
+    def permissions_version(self) -> str:
+        """
+        Версия прав пользователя - отпечаток набора его разрешений. Меняется только при изменении прав,
+        поэтому одинаково вычисляется во всех воркерах и не требует хранения
+        :return:
+        """
+        return permissions_version(self.permissions, self.is_superuser)
+
+
+def permissions_version(permissions: frozenset[str], is_superuser: bool) -> str:
+    """
+    Вычисление версии набора разрешений
+    :param permissions: коды разрешений
+    :param is_superuser: является ли пользователь суперпользователем
+    :return:
+    """
+    data = ','.join(sorted(permissions)) + f'|{int(is_superuser)}'
+    return hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+
+
+class UsersCache:
+    """
+    Потокобезопасный LRU кэш пользователей с ограниченным временем жизни записей.
+    Записи действительны, пока не сменились общие для воркеров версии: версия всех пользователей
+    (меняется при изменении прав групп) и версия конкретного пользователя (файл с его id в versions_dir).
+    Инвалидация в одном воркере меняет версию, и остальные воркеры перестают отдавать устаревшие данные
+    при следующем обращении
+    """
+    def __init__(self, ttl: float, max_size: int, version: CatalogVersion, versions_dir: str):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.version = version
+        self.versions_dir = versions_dir
+        self._items: OrderedDict[int, CachedUser] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> CachedUser | None:
+        """
+        Получение пользователя из кэша
+        :param user_id: идентификатор пользователя
+        :return: запись кэша или None, если ее нет или она устарела
+        """
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None or item.expires_at <= monotonic() or item.version != self.current_version(user_id):
+                if item is not None:
+                    del self._items[user_id]
+                self.misses += 1
+                return None
+            self._items.move_to_end(user_id)
+            self.hits += 1
+            return item
+
+    def set(self, user_id: int, user: Base, permissions: set[str], is_superuser: bool, version: str) -> CachedUser:
+        """
+        Сохранение пользователя в кэш
+        :param user_id: идентификатор пользователя
+        :param user: пользователь, отсоединенный от сессии
+        :param permissions: коды разрешений пользователя
+        :param is_superuser: является ли пользователь суперпользователем
+        :param version: версия пользователя, прочитанная до его загрузки из базы
+        :return: созданная запись кэша
+        """
+        item = CachedUser(
+            user=user,
+            permissions=frozenset(permissions),
+            is_superuser=is_superuser,
+            expires_at=monotonic() + self.ttl,
+            version=version,
+        )
+        with self._lock:
+            self._items[user_id] = item
+            self._items.move_to_end(user_id)
+            # вытесняем самые давно использованные записи
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return item
+
+    def current_version(self, user_id: int) -> str:
+        """
+        Текущая версия пользователя: общая версия и отметка файла пользователя (один вызов stat на каждую)
+        :param user_id: идентификатор пользователя
+        :return:
+        """
+        try:
+            stat = os.stat(os.path.join(self.versions_dir, str(user_id)))
+            user_version = f'{stat.st_ino}.{stat.st_mtime_ns}'
+        except FileNotFoundError:
+            user_version = '0'
+        return f'{self.version.current()}:{user_version}'
+
+    def invalidate(self, user_id: int):
+        """
+        Удаление пользователя из кэша (после сохранения изменений его данных или прав).
+        Файл версии пользователя подменяется новым, что сбрасывает его записи и в кэшах остальных воркеров,
+        не затрагивая других пользователей
+        :param user_id: идентификатор пользователя
+        :return:
+        """
+        with self._lock:
+            if self._items.pop(user_id, None) is not None:
+                self.invalidations += 1
+        os.makedirs(self.versions_dir, exist_ok=True)
+        path = os.path.join(self.versions_dir, str(user_id))
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        with open(tmp_path, 'w'):
+            pass
+        # новый файл получает новый inode, поэтому версия меняется даже при совпадении времени изменения
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        """
+        Полная очистка кэша во всех воркерах (например, после изменения прав группы)
+        :return:
+        """
+        with self._lock:
+            self.invalidations += len(self._items)
+            self._items.clear()
+        self.version.bump()
+
+    def stats(self) -> dict:
+        """
+        Статистика использования кэша
+        :return:
+        """
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / requests_count if requests_count else 0.0,
+            }
+
+
+users_cache = UsersCache(
+    ttl=app_settings.USERS_CACHE_TTL,
+    max_size=app_settings.USERS_CACHE_SIZE,
+    version=CatalogVersion(app_settings.USERS_VERSION_FILE),
+    versions_dir=app_settings.USERS_VERSIONS_DIR,
+)
@@ -0,0 +1,5 @@
+#!/bin/sh
+# подготовка базы, затем сервер заменяет shell (exec) и сам получает SIGTERM от docker stop
+set -e
+python3 /app/bootstrap.py
+exec python3 /app/serve.py
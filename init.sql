@@ -18,6 +18,20 @@ SET default_tablespace = '';
 
 SET default_table_access_method = heap;
 
+--
+-- Name: btree_gist; Type: EXTENSION; Schema: public;
+-- (целочисленный room_id в GiST индексе и ограничении исключения бронирований)
+--
+
+CREATE EXTENSION IF NOT EXISTS btree_gist WITH SCHEMA public;
+
+--
+-- Name: pg_trgm; Type: EXTENSION; Schema: public;
+-- (поиск категорий с опечатками по триграммам)
+--
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+
 
 --
 -- Name: permission; Type: TABLE; Schema: public; 
@@ -93,6 +107,7 @@ COPY public.permission (id, name, code) FROM stdin;
 39	редактирование покупок	edit_purchase
 40	отмена покупок	cancel_purchase
 41	просмотр покупок	show_purchase
+42	просмотр мониторинга	show_monitoring
 \.
 
 --